@@ -1,6 +1,9 @@
 import streamlit as st
 import sqlite3
 
+from feature_store import record_insert
+from medicine_db import medicines_version, to_iso_date
+
 def show_add_medicine_page(medicine_conn):
 
     st.markdown("""
@@ -44,8 +47,10 @@ def show_add_medicine_page(medicine_conn):
                     cursor.execute('''
                         INSERT INTO Medicines ("Patient Name", "Medicine", "Disease", "Variety", "Quantity(Packets)", "Date", "Season")
                         VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (patient_name, medicine_name, disease, variety, quantity, date, season))
+                    ''', (patient_name, medicine_name, disease, variety, quantity, to_iso_date(date), season))
+                    version = medicines_version(medicine_conn)
                     medicine_conn.commit()
+                    record_insert(medicine_conn, version, medicine_name, quantity, date, disease)
                     st.success("Medicine added successfully!")
                     st.rerun()
                 except sqlite3.Error as e:
@@ -1,25 +1,13 @@
 import streamlit as st
 import sqlite3
-from passlib.hash import bcrypt
 
-# Function to create the users table if it doesn't exist
-def create_users_table(conn):
-    try:
-        cursor = conn.cursor()
-        cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-                          id INTEGER PRIMARY KEY AUTOINCREMENT,
-                          username TEXT NOT NULL UNIQUE,
-                          password TEXT NOT NULL
-                          )''')
-        conn.commit()
-    except sqlite3.Error as e:
-        st.error(f"Error creating users table: {e}")
+from user_provisioning import hash_password, provision_users, read_users_csv
 
 # Function to add a new user
 def add_user(conn, username, password):
     try:
         cursor = conn.cursor()
-        hashed_password = bcrypt.hash(password)  # Hash the password before storing
+        hashed_password = hash_password(password)  # Hash the password before storing
         cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hashed_password))
         conn.commit()
         st.success(f"User {username} added successfully!")
@@ -32,9 +20,6 @@ def add_user(conn, username, password):
 def add_user_page(conn):
     st.header("Add New User")
 
-    # Create users table if it doesn't exist
-    create_users_table(conn)
-
     # Form to input new user details
     with st.form(key="add_user_form"):
         username = st.text_input("Username")
@@ -49,3 +34,32 @@ def add_user_page(conn):
             else:
                 add_user(conn, username, password)
 
+    bulk_add_users(conn)
+
+# Function to add users in bulk from an uploaded CSV
+def bulk_add_users(conn):
+    st.subheader("Bulk Import Users")
+    uploaded_file = st.file_uploader("CSV with username and password columns", type="csv")
+
+    if uploaded_file is not None and st.button("Import Users"):
+        try:
+            users, errors = read_users_csv(uploaded_file)
+        except ValueError as e:
+            st.error(f"Invalid CSV: {e}")
+            return
+        for error in errors:
+            st.warning(error)
+
+        progress_bar = st.progress(0.0, text="Hashing passwords...")
+        try:
+            result = provision_users(
+                conn, users,
+                progress=lambda done, total: progress_bar.progress(done / total, text=f"Hashed {done}/{total} passwords")
+            )
+        except sqlite3.Error as e:
+            st.error(f"Error adding users: {e}")
+            return
+        progress_bar.empty()
+        st.success(f"Added {len(result['added'])} users.")
+        if result["skipped"]:
+            st.info(f"Skipped existing users: {', '.join(result['skipped'])}")
@@ -11,6 +11,12 @@ from explore_page import show_explore_page
 from records import records
 from add_medicine_page import show_add_medicine_page
 from add_user_page import add_user_page
+from performance_page import show_performance_page
+from migrations import MIGRATIONS, apply_migrations
+from user_provisioning import hash_password, needs_rehash
+from config import ADMIN_USERS
+from perf_metrics import perf
+from prediction_log import prediction_log
 
 # Constants
 DB_PATH_USERS = "users.db"
@@ -19,35 +25,30 @@ IMAGE_PATH = "assets/login_image.png"  # Use a relative path for web hosting
 STYLES_PATH = "styles.css"
 
 @st.cache_resource
-def create_connection(db_file):
-    """Create a connection to the SQLite database."""
+def create_connection(db_file, schema=None):
+    """Create a connection to the SQLite database.
+
+    Pending migrations for ``schema`` are applied here, so schema changes
+    run once per process rather than on every rerun. Errors are raised,
+    so a failed attempt is not cached and the next rerun tries again.
+    """
+    conn = sqlite3.connect(db_file, check_same_thread=False)
     try:
-        conn = sqlite3.connect(db_file, check_same_thread=False)
-        return conn
-    except sqlite3.Error as e:
+        if schema is not None:
+            apply_migrations(conn, MIGRATIONS[schema])
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+def connect(db_file, schema=None):
+    """Return the cached connection for ``db_file``, or None after reporting the error."""
+    try:
+        return create_connection(db_file, schema)
+    except (sqlite3.Error, ValueError) as e:
         st.error(f"Error connecting to database: {e}")
         return None
 
-def create_medicines_table(conn):
-    """Create the medicines table if it doesn't exist."""
-    if conn is None:
-        return
-    try:
-        cursor = conn.cursor()
-        cursor.execute('''CREATE TABLE IF NOT EXISTS Medicines (
-                          id INTEGER PRIMARY KEY AUTOINCREMENT,
-                          "Patient Name" TEXT NOT NULL,
-                          "Medicine" TEXT,
-                          "Disease" TEXT,
-                          "Variety" TEXT,
-                          "Quantity(Packets)" INTEGER NOT NULL,
-                          "Date" DATE NOT NULL,
-                          "Season" TEXT
-                          )''')
-        conn.commit()
-    except sqlite3.Error as e:
-        st.error(f"Error creating Medicine table: {e}")
-
 def load_css():
     """Load and apply custom CSS styles."""
     try:
@@ -77,7 +78,13 @@ def authenticate_user(username, password, conn):
         user = cursor.fetchone()
         if user:
             hashed_password = user[1]
-            if bcrypt.verify(password, hashed_password):
+            with perf.timer("auth.bcrypt_verify"):
+                verified = bcrypt.verify(password, hashed_password)
+            if verified:
+                if needs_rehash(hashed_password):
+                    # Upgrade hashes made with a lower cost on successful login
+                    cursor.execute("UPDATE users SET password=? WHERE username=?", (hash_password(password), username))
+                    conn.commit()
                 st.session_state["authenticated"] = True
                 st.session_state["user"] = username
                 st.session_state["login_error"] = ""
@@ -97,36 +104,6 @@ def logout():
     st.session_state.pop("records_page", None)
     st.session_state.pop("section", None)
 
-def create_users_table(conn):
-    """Create the users table if it doesn't exist."""
-    if conn is None:
-        return
-    try:
-        cursor = conn.cursor()
-        cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL UNIQUE,
-            password TEXT NOT NULL
-        )''')
-        conn.commit()
-    except sqlite3.Error as e:
-        st.error(f"Error creating users table: {e}")
-
-def seed_default_user(conn):
-    """Seed the users table with a default user if not present."""
-    if conn is None:
-        return
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE username=?", ("Tedros",))
-        if cursor.fetchone() is None:
-            from passlib.hash import bcrypt
-            hashed_password = bcrypt.hash("pass123")
-            cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", ("Tedros", hashed_password))
-            conn.commit()
-    except sqlite3.Error as e:
-        st.error(f"Error seeding default user: {e}")
-
 def main():
     """Main application entry point."""
     st.title('💊 Drug Prescription and Disease Dataset Analysis')
@@ -136,13 +113,11 @@ def main():
     hide_streamlit_elements()
 
     # Connect to databases
-    conn = create_connection(DB_PATH_USERS)
-    medicine_conn = create_connection(DB_PATH_MEDICINE)
-
-    # Ensure users table exists and seed default user
-    if conn is not None:
-        create_users_table(conn)
-        seed_default_user(conn)
+    conn = connect(DB_PATH_USERS, "users")
+    medicine_conn = connect(DB_PATH_MEDICINE, "medicines")
+    if medicine_conn is not None:
+        # Predictions are logged to the Medicines database by a background thread
+        prediction_log.open(DB_PATH_MEDICINE)
 
     # Initialize session state variables
     if "authenticated" not in st.session_state:
@@ -178,9 +153,7 @@ def main():
         # Main application
         st.sidebar.title(f"👤 Welcome, {st.session_state['user']}!")
 
-        if medicine_conn is not None:
-            create_medicines_table(medicine_conn)
-        else:
+        if medicine_conn is None:
             st.error("Failed to connect to the Medicine database.")
             return
 
@@ -202,33 +175,42 @@ def main():
             st.session_state["records_page"] = None
 
             # Display the selected page
-            if st.session_state["page"] == "Predict":
-                show_predict_page()
-            elif st.session_state["page"] == "Explore":
-                show_explore_page()
+            with perf.page(st.session_state["page"]):
+                if st.session_state["page"] == "Predict":
+                    show_predict_page(conn=medicine_conn)
+                elif st.session_state["page"] == "Explore":
+                    show_explore_page(medicine_conn)
 
         elif section_selection == "Records":
             # Records Menu
+            records_pages = ["View Records", "Add New Medicine", "Add Users"]
+            if st.session_state["user"] in ADMIN_USERS:
+                records_pages.append("Performance")
             records_menu = st.sidebar.selectbox(
                 "📋 Records Menu",
-                ["View Records", "Add New Medicine", "Add Users"],
+                records_pages,
                 key="records_menu_selectbox"
             )
             st.session_state["page"] = "Records"
             st.session_state["records_page"] = records_menu
 
             # Handle records menu
-            if st.session_state["records_page"] == "View Records":
-                records(medicine_conn)
-            elif st.session_state["records_page"] == "Add New Medicine":
-                show_add_medicine_page(medicine_conn)
-            elif st.session_state["records_page"] == "Add Users":
-                add_user_page(conn)
+            with perf.page(st.session_state["records_page"]):
+                if st.session_state["records_page"] == "View Records":
+                    records(medicine_conn)
+                elif st.session_state["records_page"] == "Add New Medicine":
+                    show_add_medicine_page(medicine_conn)
+                elif st.session_state["records_page"] == "Add Users":
+                    add_user_page(conn)
+                elif st.session_state["records_page"] == "Performance":
+                    show_performance_page()
 
         # Logout button
         if st.sidebar.button("🚪 Log Out", key="logout_button"):
             logout()
             st.rerun()
 
+    perf.maybe_write_prometheus()
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,327 @@
+"""Score every model artifact in ``Model/`` on a time-based holdout.
+
+Example::
+
+    python bakeoff.py                               # last 6 months held out, report to Model/bakeoff.json
+    python bakeoff.py --holdout-months 12 --jobs 4 --metric mae
+
+Each model file (``*.pkl``, ``model_saved``, compiled ``*.npz``) is paired
+with its feature columns: the names stored in the model, the ``.json``
+metadata written by ``train_pipeline.py``, or otherwise every
+``feature_columns*.pkl``/``features*.pkl`` list of the right length.
+Pairs are scored in parallel worker processes. Each result records
+MAE/RMSE/R2 on the holdout, batch and single-row predict latency, load
+time and the memory the load added to the process.
+
+The artifacts were trained for two different tasks. Models with
+``Disease_*`` columns predict the quantity of a single prescription row.
+All other models predict a medicine's monthly total from the previous
+month, which is what the Predict page shows. Metrics are only comparable
+within a task, so the champion is the best monthly model whose features
+the Predict page can build. The app loads that champion from the report
+(see ``model_registry.champion_artifacts``).
+
+Run with ``--jobs 1`` when latency numbers matter more than wall time:
+parallel workers compete for the same cores.
+"""
+import argparse
+import json
+import logging
+import resource
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.exceptions import InconsistentVersionWarning
+
+from benchmark import measure
+from config import BAKEOFF_REPORT, HISTORICAL_DATA_PATH
+from data_loader import _parse_csv
+from model_registry import artifact_metadata, load_artifact
+from train_pipeline import MODEL_DIR, TARGET, monthly_quantities_from_csv, regression_metrics
+
+DEFAULT_HOLDOUT_MONTHS = 6
+DEFAULT_REPEAT = 3
+MONTHLY, PRESCRIPTION = "monthly", "prescription"
+CATEGORIES = ("Medicine", "Disease", "Season", "Quarter")
+LAGS = (1, 2, 3)
+APP_COLUMNS = ["Year", "Month", "Prev_Month_Quantity"]  # followed by Season_* (see preprocess_input)
+METRICS = {"rmse": False, "mae": False, "r2": True}  # metric -> higher is better
+
+# Per-process state, set once by _init_worker
+_worker = {}
+
+
+def _add_features(frame, group_column):
+    """Add calendar, lag and one-hot columns; lags follow ``group_column`` in date order."""
+    frame["Quarter"] = (frame["Month"] - 1) // 3 + 1
+    lagged = frame.groupby(group_column)[TARGET]
+    for lag in LAGS:
+        frame[f"Lag_{lag}"] = lagged.shift(lag)
+    frame["Prev_Month_Quantity"] = frame["Lag_1"]
+    dummies = pd.get_dummies(frame[[c for c in CATEGORIES if c in frame]].astype(str), dtype=float)
+    return pd.concat([frame, dummies], axis=1)
+
+
+def monthly_frame(dataset_path=HISTORICAL_DATA_PATH):
+    """Monthly totals per (Medicine, Season), as ``train_pipeline`` trains on."""
+    monthly = monthly_quantities_from_csv(dataset_path)
+    monthly = monthly.sort_values(["Year", "Month", "Medicine", "Season"]).reset_index(drop=True)
+    return _add_features(monthly, "Medicine")
+
+
+def prescription_frame(dataset_path=HISTORICAL_DATA_PATH):
+    """One row per prescription, as the ``model_saved*`` notebooks trained on."""
+    df = _parse_csv(dataset_path).sort_values("Date", kind="stable").reset_index(drop=True)
+    df["Year"] = df["Date"].dt.year
+    df["Month"] = df["Date"].dt.month
+    df = df[["Year", "Month", "Medicine", "Disease", "Season", TARGET]]
+    return _add_features(df, "Medicine")
+
+
+def holdout_start(frame, months):
+    """Return the (Year, Month) where the last ``months`` months of ``frame`` begin."""
+    periods = sorted(set(zip(frame["Year"], frame["Month"])))
+    return periods[max(len(periods) - months, 0)]
+
+
+def split_holdout(frame, start):
+    periods = frame["Year"] * 12 + frame["Month"]
+    return frame[periods >= start[0] * 12 + start[1]]
+
+
+def task_for(columns):
+    return PRESCRIPTION if any(column.startswith("Disease_") for column in columns) else MONTHLY
+
+
+def design_matrix(frame, columns):
+    """Build ``X`` in ``columns`` order.
+
+    One-hot columns for categories missing from the data are all zero, as
+    in ``preprocess_input``. Raises ``KeyError`` for columns that cannot be
+    built. Rows missing a lag the model needs are dropped.
+    """
+    unknown = [c for c in columns if c not in frame and c.split("_", 1)[0] not in CATEGORIES]
+    if unknown:
+        raise KeyError(f"cannot build feature columns {unknown}")
+    X = frame.reindex(columns=list(columns), fill_value=0.0).astype(float)
+    keep = X.notna().all(axis=1).to_numpy()
+    return X.to_numpy()[keep], frame[TARGET].to_numpy(dtype=float)[keep]
+
+
+def app_servable(columns, feature_columns_path):
+    """True if the Predict page can build these features from a feature columns file."""
+    return (feature_columns_path is not None and list(columns[:3]) == APP_COLUMNS
+            and all(column.startswith("Season_") for column in columns[3:]))
+
+
+def find_feature_columns(model_dir):
+    """Return ``{path: columns}`` for the feature column lists in ``model_dir``."""
+    lists = {}
+    for path in sorted(Path(model_dir).glob("feature*.pkl")):
+        try:
+            columns = joblib.load(path)
+        except Exception:
+            continue
+        if isinstance(columns, (list, tuple, pd.Index, np.ndarray)):
+            lists[str(path)] = [str(column) for column in columns]
+    return lists
+
+
+def find_models(model_dir):
+    """Every file in ``model_dir`` that may hold a model."""
+    model_dir = Path(model_dir)
+    paths = [p for p in model_dir.glob("*.pkl") if not p.name.startswith("feature")]
+    paths += list(model_dir.glob("*.npz"))
+    paths += [p for p in model_dir.iterdir() if p.is_file() and not p.suffix]
+    return sorted(str(p) for p in paths)
+
+
+def pair_columns(model, model_path, feature_lists):
+    """Return ``[(columns, feature_columns_path)]`` for a loaded model."""
+    names = getattr(model, "feature_names_in_", None)
+    if names is None:
+        metadata = artifact_metadata(model_path)
+        names = metadata.get("feature_columns") if metadata else None
+    if names is not None:
+        names = [str(name) for name in names]
+        matches = [path for path, columns in feature_lists.items() if columns == names]
+        return [(names, matches[0] if matches else None)]
+
+    n_features = getattr(model, "n_features_in_", None)
+    pairs, seen = [], set()
+    for path, columns in feature_lists.items():
+        if len(columns) == n_features and tuple(columns) not in seen:
+            seen.add(tuple(columns))
+            pairs.append((columns, path))
+    return pairs
+
+
+def _rss_bytes():
+    """Resident memory of this process (Linux), or None where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return None
+
+
+def _load(model_path):
+    """Load a model, returning ``(model, load_seconds, memory_bytes, notes)``.
+
+    Memory is the growth of the worker's resident set; tracemalloc would
+    miss the C-allocated tree nodes sklearn builds while unpickling.
+    Workers load one model each, so nothing else competes for it.
+    """
+    notes = set()
+    baseline = _rss_bytes()
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        start = time.perf_counter()
+        model = load_artifact(model_path)
+        load_seconds = time.perf_counter() - start
+    memory = _rss_bytes()
+    for warning in caught:
+        if isinstance(warning.message, InconsistentVersionWarning):
+            notes.add(f"pickled with scikit-learn {warning.message.original_sklearn_version}")
+    return model, load_seconds, memory and memory - baseline, sorted(notes)
+
+
+def _init_worker(frames, holdout, repeat):
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    _worker.update(frames=frames, holdout=holdout, repeat=repeat)
+
+
+def evaluate_model(model_path, feature_lists):
+    """Score one model file against every feature column list it fits."""
+    base = {"model": Path(model_path).name, "model_path": model_path,
+            "file_bytes": Path(model_path).stat().st_size}
+    try:
+        model, load_seconds, memory, notes = _load(model_path)
+    except Exception as e:
+        return [dict(base, status=f"load failed: {type(e).__name__}: {e}")]
+    if not hasattr(model, "predict"):
+        return [dict(base, status=f"not a model ({type(model).__name__})")]
+    base.update(model_class=type(model).__name__, load_ms=load_seconds * 1000,
+                memory_bytes=memory, notes=notes)
+
+    pairs = pair_columns(model, model_path, feature_lists)
+    if not pairs:
+        return [dict(base, status="no feature columns file matches the model")]
+
+    results = []
+    for columns, feature_columns_path in pairs:
+        task = task_for(columns)
+        result = dict(base, feature_columns=feature_columns_path and Path(feature_columns_path).name,
+                      feature_columns_path=feature_columns_path, n_features=len(columns), task=task,
+                      app_servable=task == MONTHLY and app_servable(columns, feature_columns_path))
+        try:
+            X, y = design_matrix(_worker["holdout"][task], columns)
+            predictions = model.predict(X)
+        except Exception as e:
+            results.append(dict(result, status=f"incompatible: {e}"))
+            continue
+        repeat = _worker["repeat"]
+        results.append(dict(
+            result,
+            status="ok",
+            holdout_rows=len(y),
+            **regression_metrics(y, predictions),
+            batch_ms=measure(lambda: model.predict(X), repeat)["median_s"] * 1000,
+            single_row_ms=measure(lambda: model.predict(X[:1]), repeat)["median_s"] * 1000,
+        ))
+    return results
+
+
+def choose_champion(results, metric="rmse"):
+    """Best app-servable monthly model by ``metric``; single-row latency breaks ties."""
+    candidates = [r for r in results if r["status"] == "ok" and r["app_servable"]]
+    if not candidates:
+        return None
+    sign = -1 if METRICS[metric] else 1
+    return min(candidates, key=lambda r: (round(sign * r[metric], 9), r["single_row_ms"]))
+
+
+def run(args):
+    frames = {MONTHLY: monthly_frame(args.dataset), PRESCRIPTION: prescription_frame(args.dataset)}
+    start = holdout_start(frames[MONTHLY], args.holdout_months)
+    holdout = {task: split_holdout(frame, start) for task, frame in frames.items()}
+    feature_lists = find_feature_columns(args.model_dir)
+    models = find_models(args.model_dir)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker, max_tasks_per_child=1,
+                             initargs=(frames, holdout, args.repeat)) as executor:
+        futures = [executor.submit(evaluate_model, path, feature_lists) for path in models]
+        for future in as_completed(futures):
+            results.extend(future.result())
+    results.sort(key=lambda r: (r["status"] != "ok", r.get("task", ""), r.get(args.metric, np.inf)))
+
+    champion = choose_champion(results, args.metric)
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "dataset": str(args.dataset),
+        "holdout_start": f"{start[0]}-{start[1]:02d}",
+        "holdout_months": args.holdout_months,
+        "holdout_rows": {task: len(frame) for task, frame in holdout.items()},
+        "metric": args.metric,
+        "champion": champion and {key: champion[key] for key in
+                                  ("model", "model_path", "feature_columns_path", args.metric)},
+        "results": results,
+    }
+    return report
+
+
+def print_report(report):
+    ok = pd.DataFrame([r for r in report["results"] if r["status"] == "ok"])
+    print(f"Holdout from {report['holdout_start']} ({report['holdout_rows']} rows)")
+    if not ok.empty:
+        columns = ["task", "model", "feature_columns", "mae", "rmse", "r2",
+                   "batch_ms", "single_row_ms", "load_ms", "memory_bytes", "app_servable"]
+        ok["memory_bytes"] = (ok["memory_bytes"] / 2 ** 20).round(1)
+        ok["feature_columns"] = ok["feature_columns"].fillna("(in model)")
+        print(ok[columns].rename(columns={"memory_bytes": "memory_mb"})
+              .to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    for r in report["results"]:
+        if r["status"] != "ok":
+            print(f"skipped {r['model']}: {r['status']}")
+    champion = report["champion"]
+    if champion:
+        print(f"Champion: {champion['model']} with {champion['feature_columns_path']} "
+              f"({report['metric']} {champion[report['metric']]:.3f})")
+    else:
+        print("No model the Predict page can serve was scored", file=sys.stderr)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score every model in Model/ on a time-based holdout.")
+    parser.add_argument("--dataset", default=str(HISTORICAL_DATA_PATH))
+    parser.add_argument("--model-dir", default=str(MODEL_DIR))
+    parser.add_argument("--holdout-months", type=int, default=DEFAULT_HOLDOUT_MONTHS,
+                        help="score on the last N months of the dataset")
+    parser.add_argument("--metric", choices=sorted(METRICS), default="rmse", help="how the champion is chosen")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="latency timing repeats")
+    parser.add_argument("--output", default=str(BAKEOFF_REPORT),
+                        help="JSON report the app reads the champion from")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    args = parse_args(argv)
+    report = run(args)
+    print_report(report)
+    Path(args.output).write_text(json.dumps(report, indent=2, default=float))
+    print(f"Wrote {args.output}")
+    return 0 if report["champion"] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
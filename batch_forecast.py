@@ -0,0 +1,236 @@
+"""Headless batch forecasting for every medicine in the historical dataset.
+
+Example::
+
+    python batch_forecast.py --start-year 2025 --years 3 --output forecasts.csv
+    python batch_forecast.py --output Historical_Data_Medicine.db --workers 8
+    python batch_forecast.py --start-year 2025 --years 5 --recursive
+    python batch_forecast.py --database Historical_Data_Medicine.db
+
+Like the Predict page, it serves the ``bakeoff.py`` champion unless
+``--model`` is given, and with ``--database`` it takes the medicines and
+lags from the Medicines database while that has rows.
+"""
+import argparse
+import csv
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from config import HISTORICAL_DATA_PATH, PROJECT_DIR
+from data_loader import load_historical_data
+from feature_store import get_feature_store
+from medicine_db import summary_medicine_diseases
+from migrations import MEDICINES_MIGRATIONS, apply_migrations
+from model_registry import champion_artifacts, compiled_or_original, registry
+from predict_page import forecast_recursive, preprocess_batch
+
+DEFAULT_MODEL_PATH = PROJECT_DIR / "Model" / "best_rf_model.pkl"
+DEFAULT_FEATURE_COLUMNS_PATH = PROJECT_DIR / "Model" / "feature_columns.pkl"
+SEASONS = ("Wet", "Dry")
+MONTHS = np.arange(1, 13)
+FORECAST_COLUMNS = ["Medicine", "Year", "Month", "Season", "Predicted Quantity", "model_version"]
+
+# Per-process state, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(model_path, feature_columns_path, feature_store, recursive=False):
+    model, model_version = registry.get(model_path)
+    feature_columns, _ = registry.get(feature_columns_path)
+    _worker.update(model=model, model_version=model_version, feature_columns=feature_columns,
+                   feature_store=feature_store, recursive=recursive)
+
+
+def _recursive_predictions(medicines, years, season):
+    """Recursive forecast from the month after the history (or January of
+    the first year, if earlier) through December of the last year, as an
+    array of shape ``(len(years), len(medicines), 12)``."""
+    feature_store = _worker["feature_store"]
+    start = min((years[0], 1), feature_store.reference_month() or (years[0], 1))
+    horizon = (years[-1] - start[0]) * 12 + 12 - (start[1] - 1)
+    path = forecast_recursive(_worker["model"].predict, *start, horizon, medicines, season,
+                              _worker["feature_columns"], feature_store)
+    return path[:, -12 * len(years):].reshape(len(medicines), len(years), len(MONTHS)).swapaxes(0, 1)
+
+
+def forecast_shard(medicines, years):
+    """Forecast every month and season of ``years`` for a shard of medicines.
+
+    The whole shard is scored with a single ``predict`` call, or with one
+    call per forecast month in recursive mode.
+    """
+    feature_columns = _worker["feature_columns"]
+    feature_store = _worker["feature_store"]
+    if _worker["recursive"]:
+        keys = [(year, season) for season in SEASONS for year in years]
+        predictions = np.concatenate([_recursive_predictions(medicines, years, season) for season in SEASONS])
+        predictions = np.rint(predictions).astype(int)
+    else:
+        blocks, keys = [], []
+        for year in years:
+            for season in SEASONS:
+                blocks.append(preprocess_batch(year, MONTHS, medicines, season, feature_columns, None, feature_store))
+                keys.append((year, season))
+
+        predictions = np.rint(_worker["model"].predict(np.vstack(blocks))).astype(int)
+        predictions = predictions.reshape(len(keys), len(medicines), len(MONTHS))
+
+    model_version = _worker["model_version"]
+    rows = []
+    for (year, season), block in zip(keys, predictions):
+        for medicine, values in zip(medicines, block):
+            for month, value in zip(MONTHS, values):
+                rows.append((medicine, int(year), int(month), season, int(value), model_version))
+    return rows
+
+
+class CsvSink:
+    def __init__(self, path):
+        self._file = open(path, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(FORECAST_COLUMNS)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class SqliteSink:
+    def __init__(self, path, table="forecasts"):
+        self._conn = sqlite3.connect(path)
+        self._table = table
+        self._created_at = datetime.now().isoformat(timespec="seconds")
+        self._conn.execute(f'''CREATE TABLE IF NOT EXISTS "{table}" (
+                               "Medicine" TEXT NOT NULL,
+                               "Year" INTEGER NOT NULL,
+                               "Month" INTEGER NOT NULL,
+                               "Season" TEXT NOT NULL,
+                               "Predicted Quantity" INTEGER NOT NULL,
+                               "model_version" TEXT,
+                               "created_at" TEXT,
+                               PRIMARY KEY ("Medicine", "Year", "Month", "Season")
+                               )''')
+
+    def write(self, rows):
+        with self._conn:
+            self._conn.executemany(
+                f'INSERT OR REPLACE INTO "{self._table}" VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [row + (self._created_at,) for row in rows],
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+def open_sink(output, table):
+    if Path(output).suffix.lower() in (".db", ".sqlite", ".sqlite3"):
+        return SqliteSink(output, table)
+    return CsvSink(output)
+
+
+def _shards(medicines, years, shard_size, split_years=True):
+    for i in range(0, len(medicines), shard_size):
+        if not split_years:
+            yield medicines[i:i + shard_size], years
+            continue
+        for j in range(0, len(years), shard_size):
+            yield medicines[i:i + shard_size], years[j:j + shard_size]
+
+
+def resolve_artifacts(model_path=None, feature_columns_path=None):
+    """Return the model and feature-column paths to serve, defaulting to
+    the champion as the Predict page does."""
+    if model_path is None:
+        model_path, champion_columns = champion_artifacts() or (DEFAULT_MODEL_PATH, DEFAULT_FEATURE_COLUMNS_PATH)
+        if feature_columns_path is None:
+            feature_columns_path = champion_columns
+    if feature_columns_path is None:
+        feature_columns_path = DEFAULT_FEATURE_COLUMNS_PATH
+    return str(model_path), str(feature_columns_path)
+
+
+def load_inputs(dataset_path, database=None):
+    """Return ``(medicines, feature_store)`` from the Medicines database
+    while it has rows, otherwise from the historical dataset."""
+    if database is None:
+        df = load_historical_data(dataset_path)
+        return list(df['Medicine'].unique()), get_feature_store(dataset_path)
+    conn = sqlite3.connect(database)
+    try:
+        apply_migrations(conn, MEDICINES_MIGRATIONS)
+        feature_store = get_feature_store(dataset_path, conn)
+        medicines = list(summary_medicine_diseases(conn))
+    finally:
+        conn.close()
+    if not medicines:
+        medicines = list(load_historical_data(dataset_path)['Medicine'].unique())
+    return medicines, feature_store
+
+
+def run(args):
+    model_path, feature_columns_path = resolve_artifacts(args.model, args.feature_columns)
+    all_medicines, feature_store = load_inputs(args.dataset, args.database)
+    medicines = list(args.medicines or all_medicines)
+    years = list(range(args.start_year, args.start_year + args.years))
+
+    sink = open_sink(args.output, args.table)
+    total_rows = 0
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            initializer=_init_worker,
+            initargs=(compiled_or_original(model_path), feature_columns_path, feature_store, args.recursive),
+        ) as executor:
+            # A recursive forecast runs through all years in order, so only medicines are sharded
+            futures = [executor.submit(forecast_shard, shard_medicines, shard_years)
+                       for shard_medicines, shard_years in _shards(medicines, years, args.shard_size,
+                                                                   split_years=not args.recursive)]
+            for future in as_completed(futures):
+                rows = future.result()
+                sink.write(rows)
+                total_rows += len(rows)
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {total_rows} forecasts to {args.output} in {elapsed:.2f}s "
+          f"({total_rows / elapsed:,.0f} rows/s)")
+    return total_rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Forecast medicine quantities for the whole catalogue.")
+    parser.add_argument("--start-year", type=int, default=datetime.now().year)
+    parser.add_argument("--years", type=int, default=1, help="number of years to forecast")
+    parser.add_argument("--medicines", nargs="*", help="limit the run to these medicines")
+    parser.add_argument("--model", help="model artifact (default: the bakeoff champion, else best_rf_model.pkl)")
+    parser.add_argument("--feature-columns",
+                        help="feature columns artifact (default: the model's, else feature_columns.pkl)")
+    parser.add_argument("--dataset", default=str(HISTORICAL_DATA_PATH))
+    parser.add_argument("--database",
+                        help="Medicines database to take medicines and lags from, as the Predict page does "
+                             "(default: the dataset only)")
+    parser.add_argument("--output", default="forecasts.csv",
+                        help="CSV file, or a .db/.sqlite file to write a forecasts table into")
+    parser.add_argument("--table", default="forecasts", help="SQLite table name")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--recursive", action="store_true",
+                        help="feed each month's forecast back in as the next month's lag")
+    parser.add_argument("--shard-size", type=int, default=4,
+                        help="medicines and years per worker task")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    run(parse_args())
@@ -0,0 +1,301 @@
+"""Headless micro-benchmarks for the prediction, data-loading and Records paths.
+
+Example::
+
+    python benchmark.py --output bench-main.json
+    python benchmark.py --sizes 1000 100000 --output bench-new.json --compare bench-main.json
+
+Every benchmark is timed over several repeats and reported by its median.
+Results are written as JSON. With ``--compare`` the run is checked against
+an earlier results file, and the exit status is 1 if any shared benchmark
+got slower by more than ``--threshold`` (relative, default 0.2 = 20%).
+"""
+import argparse
+import json
+import logging
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from config import MODEL_PATH, PROJECT_DIR
+from data_loader import DATE_FORMAT, _parse_csv
+from explore_page import CUBE_DIMENSIONS, build_quantity_histogram
+from feature_store import FeatureStore
+from medicine_db import MEDICINES_COLUMNS, read_monthly_quantities
+from migrations import MEDICINES_MIGRATIONS, apply_migrations
+from predict_page import MONTH_MAP, preprocess_batch, preprocess_input
+from records import build_filters, count_records, fetch_page, iter_record_chunks
+from synthetic_data import DataProfile, synthetic_history
+from tree_engine import compile_model
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.2
+FEATURE_COLUMNS_PATH = PROJECT_DIR / "Model" / "feature_columns.pkl"
+MODEL_ARTIFACTS = sorted((PROJECT_DIR / "Model").glob("*.pkl")) + [PROJECT_DIR / "Model" / "model_saved", MODEL_PATH]
+
+
+def measure(func, repeat=DEFAULT_REPEAT, setup=None):
+    """Time ``func`` and return summary statistics in seconds per call.
+
+    Without ``setup`` the loop count is calibrated like ``timeit`` so each
+    repeat runs for at least 0.2s. With ``setup``, it is called untimed
+    before every single call and its return value is passed to ``func``;
+    use this for benchmarks that consume their input (e.g. inserts).
+    """
+    if setup is None:
+        timer = timeit.Timer(func)
+        loops, _ = timer.autorange()
+        times = [t / loops for t in timer.repeat(repeat=repeat, number=loops)]
+    else:
+        loops, times = 1, []
+        for _ in range(repeat):
+            state = setup()
+            start = time.perf_counter()
+            func(state)
+            times.append(time.perf_counter() - start)
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "mean_s": statistics.fmean(times),
+        "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "loops": loops,
+        "repeat": repeat,
+    }
+
+
+def _medicines_db(path):
+    conn = sqlite3.connect(path)
+    apply_migrations(conn, MEDICINES_MIGRATIONS)
+    return conn
+
+
+def _medicine_rows(history):
+    rows = history[list(MEDICINES_COLUMNS)].copy()
+    rows["Date"] = pd.to_datetime(rows["Date"], format=DATE_FORMAT).dt.strftime("%Y-%m-%d")
+    return list(rows.itertuples(index=False, name=None))
+
+
+_COLUMN_LIST = ", ".join(f'"{column}"' for column in MEDICINES_COLUMNS)
+_INSERT_SQL = f'INSERT INTO Medicines ({_COLUMN_LIST}) VALUES ({", ".join("?" * len(MEDICINES_COLUMNS))})'
+
+
+def feature_benchmarks(history):
+    feature_columns = joblib.load(FEATURE_COLUMNS_PATH)
+    # Parsed as load_historical_data returns it
+    history = history.assign(Date=pd.to_datetime(history["Date"], format=DATE_FORMAT))
+    medicines = sorted(history["Medicine"].unique())
+    feature_store = FeatureStore.from_dataframe(history)
+    months = list(MONTH_MAP)
+    yield "features.feature_store_build", lambda: FeatureStore.from_dataframe(history)
+    yield "features.feature_store_lookup", lambda: [feature_store.features(medicine) for medicine in medicines]
+    # The per-month loop the Predict page used to run, with and without the store
+    yield "features.preprocess_input_scan", lambda: [
+        preprocess_input(2025, month, medicines, "Wet", feature_columns, history) for month in months]
+    yield "features.preprocess_input_indexed", lambda: [
+        preprocess_input(2025, month, medicines, "Wet", feature_columns, history, feature_store) for month in months]
+    yield "features.preprocess_batch", lambda: preprocess_batch(
+        2025, np.arange(1, 13), medicines, "Wet", feature_columns, history, feature_store)
+
+
+def data_benchmarks(history, size, workdir):
+    csv_path = workdir / f"history-{size}.csv"
+    parquet_path = workdir / f"history-{size}.parquet"
+    history.to_csv(csv_path, index=False)
+    parsed = _parse_csv(csv_path)
+    parsed.to_parquet(parquet_path, index=False)
+
+    def explore_frame():
+        # explore_page.load_data on an already parsed frame
+        train_data = parsed.copy()
+        train_data["Date"] = train_data["Date"].dt.to_period("M")
+        train_data["Year"] = train_data["Date"].dt.year
+        train_data["Month"] = train_data["Date"].dt.month
+        return train_data
+
+    train_data = explore_frame()
+    yield "data.parse_csv", lambda: _parse_csv(csv_path)
+    yield "data.read_parquet_snapshot", lambda: pd.read_parquet(parquet_path)
+    yield "data.explore_load_data", explore_frame
+    yield "data.explore_histogram", lambda: build_quantity_histogram(train_data[CUBE_DIMENSIONS + ["Quantity(Packets)"]])
+
+
+def sqlite_benchmarks(history, size, workdir):
+    rows = _medicine_rows(history)
+    db_path = workdir / f"medicines-{size}.db"
+    conn = _medicines_db(db_path)
+    with conn:
+        conn.executemany(_INSERT_SQL, rows)
+    medicine = history["Medicine"].mode()[0]
+    where, params = build_filters(medicines=[medicine], seasons=["Wet"])
+    last_page = max(count_records(conn, where, params) - 10, 0)
+
+    def fresh_db():
+        path = workdir / "insert.db"
+        path.unlink(missing_ok=True)
+        return _medicines_db(path)
+
+    def insert(insert_conn):
+        with insert_conn:
+            insert_conn.executemany(_INSERT_SQL, rows)
+        insert_conn.close()
+
+    yield "sqlite.insert", insert, fresh_db
+    yield "sqlite.count_filtered", lambda: count_records(conn, where, params)
+    yield "sqlite.fetch_first_page", lambda: fetch_page(conn, where, params, 10, 0)
+    yield "sqlite.fetch_last_page", lambda: fetch_page(conn, where, params, 10, last_page)
+    yield "sqlite.export_chunks", lambda: sum(len(chunk) for chunk in iter_record_chunks(str(db_path)))
+    yield "sqlite.monthly_quantities", lambda: read_monthly_quantities(conn)
+
+
+def inference_benchmarks(sizes):
+    """Yield ``(name, size, func)`` for loading and scoring every model artifact.
+
+    Artifacts that are not models or cannot be loaded in this environment
+    are returned as ``(name, None, reason)``.
+    """
+    rng = np.random.default_rng(0)
+    for path in MODEL_ARTIFACTS:
+        name = f"inference.{path.relative_to(PROJECT_DIR).as_posix()}"
+        try:
+            model = joblib.load(path, mmap_mode="r")
+        except Exception as e:
+            yield name, None, f"{type(e).__name__}: {e}"
+            continue
+        if not hasattr(model, "predict"):
+            continue
+        n_features = getattr(model, "n_features_in_", 4)
+        yield f"{name}.load", None, lambda path=path: joblib.load(path, mmap_mode="r")
+        variants = {name: model}
+        try:
+            variants[f"{name}.compiled"] = compile_model(model)
+        except ValueError:
+            pass
+        single = rng.uniform(0, 20, size=(1, n_features))
+        batches = {size: rng.uniform(0, 20, size=(size, n_features)) for size in sizes}
+        for variant, scorer in variants.items():
+            yield f"{variant}.single", 1, lambda scorer=scorer, X=single: scorer.predict(X)
+            for size, batch in batches.items():
+                yield f"{variant}.batch", size, lambda scorer=scorer, X=batch: scorer.predict(X)
+
+
+def run(sizes, repeat=DEFAULT_REPEAT, only=None, progress=None):
+    """Run the suite and return the results document."""
+    results, skipped = {}, {}
+
+    def record(name, size, func, setup=None):
+        key = name if size is None else f"{name}[n={size}]"
+        if only and not any(pattern in key for pattern in only):
+            return
+        stats = measure(func, repeat, setup)
+        stats.update(name=name, size=size)
+        results[key] = stats
+        if progress:
+            progress(key, stats)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        profile = DataProfile.from_csv()
+        for size in sizes:
+            history = synthetic_history(size, profile=profile)
+            for group in (feature_benchmarks(history),
+                          data_benchmarks(history, size, workdir),
+                          sqlite_benchmarks(history, size, workdir)):
+                for name, func, *setup in group:
+                    record(name, size, func, *setup)
+        for name, size, func in inference_benchmarks(sizes):
+            if isinstance(func, str):
+                skipped[name] = func
+            else:
+                record(name, size, func)
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "sqlite": sqlite3.sqlite_version,
+            "sizes": list(sizes),
+            "repeat": repeat,
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare two results documents by median time.
+
+    Returns ``{benchmark: (baseline s, current s, ratio)}`` for benchmarks
+    present in both runs that got slower than ``1 + threshold`` times.
+    """
+    regressions = {}
+    for key, stats in current["results"].items():
+        previous = baseline["results"].get(key)
+        if previous is None or not previous["median_s"]:
+            continue
+        ratio = stats["median_s"] / previous["median_s"]
+        if ratio > 1 + threshold:
+            regressions[key] = (previous["median_s"], stats["median_s"], ratio)
+    return regressions
+
+
+def _format_seconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g}{unit}"
+    return f"{seconds / 1e-9:.3g}ns"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the prediction, data-loading and Records micro-benchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="dataset sizes (rows) to benchmark")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--only", nargs="+", help="run only benchmarks whose name contains one of these")
+    parser.add_argument("--output", help="write results JSON to this file")
+    parser.add_argument("--compare", help="results JSON of an earlier run to check against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed relative slowdown before a benchmark counts as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    warnings.filterwarnings("ignore")
+    args = parse_args(argv)
+    document = run(args.sizes, args.repeat, args.only,
+                   lambda key, stats: print(f"{key:<70} {_format_seconds(stats['median_s']):>10}", flush=True))
+    for name, reason in document["skipped"].items():
+        print(f"skipped {name}: {reason}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(document, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(document, baseline, args.threshold)
+        for key, (before, after, ratio) in regressions.items():
+            print(f"REGRESSION {key}: {_format_seconds(before)} -> {_format_seconds(after)} ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions over {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
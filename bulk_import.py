@@ -0,0 +1,148 @@
+"""Streaming bulk import of historical CSVs into the Medicines table.
+
+Example::
+
+    python bulk_import.py Historical_Data_7_Aug_2024.csv medicine.csv
+    python bulk_import.py big.csv --database Historical_Data_Medicine.db --chunksize 100000
+
+Files are read in fixed-size chunks, so memory stays bounded regardless of
+file size. Each chunk is validated and deduplicated with vectorized pandas
+checks and inserted with ``executemany`` in a single transaction.
+"""
+import argparse
+import sqlite3
+import sys
+import time
+
+import pandas as pd
+
+from medicine_db import MEDICINES_COLUMNS
+from migrations import MEDICINES_MIGRATIONS, apply_migrations
+
+DEFAULT_CHUNKSIZE = 50_000
+SEASONS = ("Wet", "Dry")
+# Header spellings used by the CSVs shipped with the app
+COLUMN_ALIASES = {"Patient": "Patient Name"}
+
+_COLUMN_LIST = ", ".join(f'"{column}"' for column in MEDICINES_COLUMNS)
+_STAGING_SQL = f'''CREATE TEMP TABLE IF NOT EXISTS medicines_import (
+                   "Patient Name" TEXT, "Medicine" TEXT, "Disease" TEXT, "Variety" TEXT,
+                   "Quantity(Packets)" INTEGER, "Date" TEXT, "Season" TEXT)'''
+# Skips rows that already exist in Medicines; the idx_medicines_import_dedupe
+# index from the migrations lets it seek straight to candidate rows
+_DEDUPED_INSERT_SQL = f'''INSERT INTO Medicines ({_COLUMN_LIST})
+                          SELECT DISTINCT {_COLUMN_LIST} FROM medicines_import AS s
+                          WHERE NOT EXISTS (
+                              SELECT 1 FROM Medicines AS m
+                              WHERE m."Medicine" IS s."Medicine" AND m."Date" = s."Date"
+                                AND m."Patient Name" = s."Patient Name" AND m."Disease" IS s."Disease"
+                                AND m."Variety" IS s."Variety" AND m."Season" IS s."Season"
+                                AND m."Quantity(Packets)" = s."Quantity(Packets)")'''
+
+
+def _parse_dates(values):
+    """Parse m/d/Y dates, falling back to ISO, and return ISO strings (NaN if invalid)."""
+    parsed = pd.to_datetime(values, format="%m/%d/%Y", errors="coerce")
+    missing = parsed.isna()
+    if missing.any():
+        parsed[missing] = pd.to_datetime(values[missing], format="%Y-%m-%d", errors="coerce")
+    return parsed.dt.strftime("%Y-%m-%d")
+
+
+def clean_chunk(chunk):
+    """Validate and deduplicate one chunk.
+
+    Returns ``(valid rows in MEDICINES_COLUMNS order, number of rejected rows)``.
+    """
+    chunk = chunk.rename(columns=COLUMN_ALIASES)
+    missing = [column for column in MEDICINES_COLUMNS if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    chunk = chunk[list(MEDICINES_COLUMNS)].copy()
+
+    for column in ("Patient Name", "Medicine", "Disease", "Variety", "Season"):
+        chunk[column] = chunk[column].str.strip()
+    quantity = pd.to_numeric(chunk["Quantity(Packets)"], errors="coerce")
+    chunk["Date"] = _parse_dates(chunk["Date"])
+
+    valid = (
+        chunk["Patient Name"].fillna("").ne("")
+        & chunk["Medicine"].fillna("").ne("")
+        & quantity.gt(0)
+        & quantity.eq(quantity.round())
+        & chunk["Date"].notna()
+        & chunk["Season"].isin(SEASONS)
+    )
+    chunk = chunk[valid]
+    chunk["Quantity(Packets)"] = quantity[valid].astype("int64")
+    return chunk.drop_duplicates(), int((~valid).sum())
+
+
+def import_csv(conn, path, chunksize=DEFAULT_CHUNKSIZE, dedupe=True, progress=None):
+    """Stream one CSV file into Medicines and return import counters.
+
+    ``progress`` is called after every chunk with the running counters.
+    With ``dedupe`` rows already present in Medicines are skipped.
+    """
+    stats = {"read": 0, "inserted": 0, "rejected": 0, "duplicates": 0, "seconds": 0.0}
+    start = time.perf_counter()
+    conn.execute(_STAGING_SQL)
+    reader = pd.read_csv(path, chunksize=chunksize, dtype=str, encoding="utf-8-sig",
+                         skipinitialspace=True)
+    for chunk in reader:
+        rows, rejected = clean_chunk(chunk)
+        rows = rows.astype(object).where(rows.notna(), None)
+        records = list(rows.itertuples(index=False, name=None))
+        with conn:
+            if dedupe:
+                conn.executemany("INSERT INTO medicines_import VALUES (?, ?, ?, ?, ?, ?, ?)", records)
+                inserted = conn.execute(_DEDUPED_INSERT_SQL).rowcount
+                conn.execute("DELETE FROM medicines_import")
+            else:
+                conn.executemany(f"INSERT INTO Medicines ({_COLUMN_LIST}) VALUES (?, ?, ?, ?, ?, ?, ?)", records)
+                inserted = len(records)
+
+        stats["read"] += len(chunk)
+        stats["rejected"] += rejected
+        stats["inserted"] += inserted
+        stats["duplicates"] += len(chunk) - rejected - inserted
+        stats["seconds"] = time.perf_counter() - start
+        if progress:
+            progress(stats)
+    return stats
+
+
+def _print_progress(path):
+    def report(stats):
+        rate = stats["read"] / stats["seconds"] if stats["seconds"] else 0
+        print(f"\r{path}: {stats['read']:,} read, {stats['inserted']:,} inserted, "
+              f"{stats['rejected']:,} rejected, {stats['duplicates']:,} duplicates "
+              f"({rate:,.0f} rows/s)", end="", file=sys.stderr, flush=True)
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import historical CSV files into the Medicines table.")
+    parser.add_argument("files", nargs="+", help="CSV files to import")
+    parser.add_argument("--database", default="Historical_Data_Medicine.db")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="insert rows even if an identical row already exists")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    conn = sqlite3.connect(args.database)
+    conn.execute("PRAGMA synchronous = NORMAL")
+    apply_migrations(conn, MEDICINES_MIGRATIONS)
+    try:
+        for path in args.files:
+            import_csv(conn, path, args.chunksize, not args.keep_duplicates, _print_progress(path))
+            print(file=sys.stderr)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
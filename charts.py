@@ -0,0 +1,87 @@
+"""Bounded chart payloads for the Explore and Predict pages.
+
+Charts are described by Vega-Lite specs without inline data; the data is
+passed next to the spec, so Streamlit ships it as Arrow instead of JSON
+records. Before that it is reduced to the columns the chart encodes, capped
+at ``CHART_MAX_SERIES`` series and ``CHART_MAX_POINTS`` rows, and shrunk
+further until spec and data fit in ``CHART_BYTE_BUDGET`` bytes.
+"""
+import json
+
+import pandas as pd
+import pyarrow as pa
+
+from config import CHART_BYTE_BUDGET, CHART_MAX_POINTS, CHART_MAX_SERIES
+
+BACKGROUND = '#045F5F'
+
+
+def chart_spec(chart):
+    """Return the Vega-Lite spec of an Altair chart built without data."""
+    spec = chart.configure(background=BACKGROUND).to_dict()
+    spec.pop('datasets', None)
+    spec.pop('data', None)
+    for layer in spec.get('layer', []):
+        layer.pop('data', None)
+    return spec
+
+
+def compact(data, columns, decimals=2):
+    """Keep ``columns``, round floats and downcast integers."""
+    data = data[list(columns)].reset_index(drop=True)
+    for name, column in data.items():
+        if pd.api.types.is_float_dtype(column):
+            data[name] = column.round(decimals)
+        elif pd.api.types.is_integer_dtype(column):
+            data[name] = pd.to_numeric(column, downcast='integer')
+    return data
+
+
+def limit_series(data, series, value, max_series=CHART_MAX_SERIES):
+    """Keep the ``max_series`` series with the largest total ``value``.
+
+    Returns ``(data, number of series before the cut)``.
+    """
+    totals = data.groupby(series)[value].sum()
+    if len(totals) <= max_series:
+        return data, len(totals)
+    keep = totals.nlargest(max_series).index
+    return data[data.set_index(series).index.isin(keep)], len(totals)
+
+
+def downsample(data, x, series, max_points=CHART_MAX_POINTS):
+    """Average consecutive points of each series into buckets so that at
+    most ``max_points`` rows remain in total."""
+    if len(data) <= max_points:
+        return data
+    data = data.sort_values([*series, x], ignore_index=True)
+    groups = data.groupby(series, sort=False)
+    buckets = max(max_points // groups.ngroups, 1)
+    bucket = groups.cumcount() * buckets // groups[x].transform('size')
+    numeric = data.select_dtypes('number').columns
+    aggregations = {name: 'mean' if name in numeric else 'first'
+                    for name in data.columns if name not in series}
+    return data.assign(_bucket=bucket).groupby([*series, '_bucket'], sort=False) \
+        .agg(aggregations).reset_index()[data.columns]
+
+
+def arrow_bytes(data):
+    """Size of ``data`` as the Arrow IPC stream Streamlit sends."""
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+def payload_bytes(spec, data):
+    return len(json.dumps(spec)) + arrow_bytes(data)
+
+
+def fit_budget(spec, data, x, series, budget=CHART_BYTE_BUDGET, max_points=CHART_MAX_POINTS):
+    """Downsample ``data`` until spec and data together fit in ``budget`` bytes."""
+    fitted = downsample(data, x, series, max_points)
+    while payload_bytes(spec, fitted) > budget and max_points > 1:
+        max_points = min(max_points, len(fitted)) // 2
+        fitted = downsample(data, x, series, max_points)
+    return fitted
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Project directory
@@ -13,10 +14,32 @@ DATA_DIR = PROJECT_DIR
 HISTORICAL_DATA_PATH = DATA_DIR / "Historical_Data_7_Aug_2024.csv"
 MEDICINE_CSV_PATH = DATA_DIR / "medicine.csv"
 
+# Columnar snapshots of parsed datasets
+CACHE_DIR = PROJECT_DIR / ".cache"
+
+# Prometheus text file written by perf_metrics
+METRICS_FILE = CACHE_DIR / "metrics.prom"
+
+# Users who can open the admin-only pages (Performance), as a comma-separated
+# ADMIN_USERS environment variable. Nobody is an admin when it is unset.
+ADMIN_USERS = tuple(name.strip() for name in os.environ.get("ADMIN_USERS", "").split(",") if name.strip())
+
+# Model bake-off report; the Predict page serves its champion (see bakeoff.py)
+BAKEOFF_REPORT = PROJECT_DIR / "Model" / "bakeoff.json"
+
+# Upper bounds for the data sent with each chart (see charts.py)
+CHART_MAX_POINTS = 2000
+CHART_MAX_SERIES = 20
+CHART_BYTE_BUDGET = 64 * 1024
+
 # Image path
 _LOCAL_IMAGE = PROJECT_DIR / "login_image.png"
 IMAGE_PATH = _LOCAL_IMAGE if _LOCAL_IMAGE.exists() else None
 
+# bcrypt cost factor for new password hashes. Each hash stores its own cost,
+# so raising this only affects new hashes and logins that re-hash.
+BCRYPT_ROUNDS = 12
+
 # Medicine disease mapping
 MEDICINE_DISEASE_MAP = {
     "Aspirin": "Fever",
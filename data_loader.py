@@ -0,0 +1,75 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from config import CACHE_DIR, HISTORICAL_DATA_PATH
+from perf_metrics import perf
+
+DATE_FORMAT = '%m/%d/%Y'
+
+
+def dataset_version(dataset_path=HISTORICAL_DATA_PATH):
+    """Return the (mtime_ns, size) pair that identifies a dataset's contents."""
+    stat = Path(dataset_path).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _snapshot_path(path, mtime_ns, size):
+    return CACHE_DIR / f"{path.stem}-{mtime_ns}-{size}.parquet"
+
+
+@perf.timed("dataset.parse_csv")
+def _parse_csv(path):
+    df = pd.read_csv(path)
+    df['Date'] = pd.to_datetime(df['Date'], format=DATE_FORMAT)
+    return df
+
+
+def _write_snapshot(df, snapshot):
+    """Write a Parquet snapshot atomically and drop older ones for the same file."""
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        tmp_path = snapshot.with_suffix('.tmp')
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, snapshot)
+        prefix = snapshot.name.rsplit('-', 2)[0]
+        for stale in CACHE_DIR.glob(f"{prefix}-*.parquet"):
+            if stale != snapshot:
+                stale.unlink(missing_ok=True)
+    except (ImportError, OSError):
+        # Snapshots are only an optimisation; the CSV stays the source of truth.
+        pass
+
+
+@st.cache_data(show_spinner=False)
+def _load_dataset(dataset_path, mtime_ns, size):
+    path = Path(dataset_path)
+    snapshot = _snapshot_path(path, mtime_ns, size)
+    df = None
+    if snapshot.exists():
+        try:
+            with perf.timer("dataset.read_snapshot"):
+                df = pd.read_parquet(snapshot)
+        except (ImportError, OSError, ValueError):
+            df = None
+    if df is None:
+        df = _parse_csv(path)
+        _write_snapshot(df, snapshot)
+
+    df['YearMonth'] = df['Date'].dt.to_period('M')
+    return df
+
+
+def load_historical_data(dataset_path=HISTORICAL_DATA_PATH):
+    """Load the historical dispensing data with a parsed ``Date`` and ``YearMonth``.
+
+    The parsed frame is cached across sessions and keyed on the file's mtime
+    and size, so editing the CSV invalidates it. The first parse also writes
+    a Parquet snapshot under ``CACHE_DIR`` that later cold starts read
+    instead of the CSV.
+    """
+    path = Path(dataset_path).resolve()
+    mtime_ns, size = dataset_version(path)
+    return _load_dataset(str(path), mtime_ns, size)
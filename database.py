@@ -1,5 +1,7 @@
 import sqlite3
-from passlib.hash import bcrypt
+
+from migrations import USERS_MIGRATIONS, apply_migrations
+from user_provisioning import hash_password
 
 def create_connection(db_file):
     """Create a database connection to the SQLite database specified by db_file."""
@@ -12,17 +14,10 @@ def create_connection(db_file):
     return conn
 
 def create_table(conn):
-    """Create a table from the create_table_sql statement."""
-    create_users_table = """
-    CREATE TABLE IF NOT EXISTS users (
-        username TEXT PRIMARY KEY,
-        password TEXT NOT NULL
-    );
-    """
+    """Bring the users table up to the app's schema."""
     try:
-        c = conn.cursor()
-        c.execute(create_users_table)
-        print("Table 'users' created successfully")
+        apply_migrations(conn, USERS_MIGRATIONS)
+        print("Table 'users' is up to date")
     except sqlite3.Error as e:
         print(f"The error '{e}' occurred")
 
@@ -30,7 +25,7 @@ def add_user(conn, username, password):
     """Add a new user into the users table."""
     sql = ''' INSERT INTO users(username, password)
               VALUES(?, ?) '''
-    hashed_password = bcrypt.hash(password)
+    hashed_password = hash_password(password)
     cur = conn.cursor()
     cur.execute(sql, (username, hashed_password))
     conn.commit()
@@ -41,7 +36,10 @@ def setup_database():
     conn = create_connection("users.db")
     if conn is not None:
         create_table(conn)
-        add_user(conn, "Admin", "pass123")
+        try:
+            add_user(conn, "Admin", "pass123")
+        except sqlite3.IntegrityError:
+            print("User 'Admin' already exists")
         conn.close()
     else:
         print("Error! Cannot create the database connection.")
@@ -3,6 +3,8 @@ import sqlite3
 import pandas as pd
 from datetime import datetime
 
+from medicine_db import to_iso_date
+
 def edit_page(conn):
     st.title("Edit Medicine Entry")
 
@@ -57,8 +59,8 @@ def edit_page(conn):
 
             if submit_button:
                 try:
-                    # Convert date back to database format (MM-DD-YYYY)
-                    date_str = date.strftime('%m/%d/%Y')
+                    # Convert date back to database format (YYYY-MM-DD)
+                    date_str = to_iso_date(date)
 
                     # Update the medicine entry in the database
                     cursor.execute('''
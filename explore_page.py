@@ -1,71 +1,204 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import altair as alt
 import warnings
 warnings.filterwarnings("ignore")
 
-@st.cache_data
+from charts import chart_spec, compact, fit_budget, limit_series
+from config import CHART_MAX_SERIES
+from data_loader import dataset_version, load_historical_data
+from medicine_db import read_monthly_quantities, summary_medicines
+
+CUBE_DIMENSIONS = ['Medicine', 'Disease', 'Season', 'Year', 'Month']
+QUANTITY = 'Quantity(Packets)'
+QUARTILES = {'q1': 0.25, 'median': 0.5, 'q3': 0.75}
+PLOT_TITLES = {
+    'Bar Chart': 'Bar chart of Quantity(Packets) by Medicine',
+    'Line Plot': 'Line Plot of Quantity(Packets) over Time',
+    'Box Plot': 'Box Plot of Quantity(Packets) by Medicine',
+    'Scatter Plot': 'Scatter Plot of Quantity(Packets) vs Season',
+}
+
 def load_data():
-    train_data = pd.read_csv("Historical_Data_7_Aug_2024.csv")
-    train_data["Date"] = pd.to_datetime(train_data["Date"])
+    train_data = load_historical_data().drop(columns='YearMonth')
     train_data['Date'] = train_data['Date'].dt.to_period("M")
-    monthly_sales = train_data.groupby("Date").sum().reset_index()
-    monthly_sales['Date'] = monthly_sales['Date'].dt.to_timestamp()
     train_data["Year"] = train_data["Date"].dt.year
     train_data["Month"] = train_data["Date"].dt.month
     return train_data
 
-train_data = load_data()
 
+def build_quantity_histogram(train_data):
+    """Count records per cube cell and quantity, the same shape as the SQLite summary."""
+    return train_data.groupby(CUBE_DIMENSIONS + [QUANTITY]).size().rename('Records').reset_index()
+
+
+def histogram_quantiles(histogram, keys, quantiles=QUARTILES):
+    """Per-group quantiles of a quantity histogram.
+
+    Uses linear interpolation, so the result equals ``Series.quantile``
+    over the individual records the histogram counts.
+    """
+    hist = histogram.sort_values(keys + [QUANTITY], ignore_index=True)
+    grouped = hist.groupby(keys, sort=False)['Records']
+    end = grouped.cumsum()
+    start = end - hist['Records']
+    total = grouped.transform('sum')
+    group_id = grouped.ngroup()
+    result = hist.drop_duplicates(keys)[keys].reset_index(drop=True)
+
+    def value_at(rank):
+        rows = (start <= rank) & (rank < end)
+        return pd.Series(hist.loc[rows, QUANTITY].values, index=group_id[rows].values).sort_index().values
+
+    for name, q in quantiles.items():
+        position = (total - 1) * q
+        lower = np.floor(position)
+        upper = np.minimum(lower + 1, total - 1)
+        fraction = (position - lower).groupby(group_id).first().values
+        low_values, high_values = value_at(lower), value_at(upper)
+        result[name] = low_values + fraction * (high_values - low_values)
+    return result
+
+
+def cube_from_histogram(histogram):
+    """Aggregate a quantity histogram by medicine, disease, season, year and month."""
+    weighted = histogram.assign(weighted=histogram[QUANTITY] * histogram['Records'])
+    cube = weighted.groupby(CUBE_DIMENSIONS, as_index=False).agg(
+        sum=('weighted', 'sum'), count=('Records', 'sum'), min=(QUANTITY, 'min'), max=(QUANTITY, 'max')
+    )
+    cube['mean'] = cube['sum'] / cube['count']
+    if cube.empty:
+        return cube.assign(**{name: pd.Series(dtype=float) for name in QUARTILES})
+    return cube.merge(histogram_quantiles(histogram, CUBE_DIMENSIONS), on=CUBE_DIMENSIONS)
+
+
+def distribution_from_histogram(histogram):
+    """Per-medicine box plot statistics (quartiles and 1.5 IQR whiskers)."""
+    per_medicine = histogram.groupby(['Medicine', QUANTITY], as_index=False)['Records'].sum()
+    if per_medicine.empty:
+        return pd.DataFrame(columns=['Medicine', *QUARTILES, 'lower', 'upper'])
+    stats = histogram_quantiles(per_medicine, ['Medicine']).set_index('Medicine')
+    iqr = stats['q3'] - stats['q1']
+    bounds = per_medicine.join((stats['q1'] - 1.5 * iqr).rename('low'), on='Medicine').join(
+        (stats['q3'] + 1.5 * iqr).rename('high'), on='Medicine'
+    )
+    inside = bounds[bounds[QUANTITY].between(bounds['low'], bounds['high'])]
+    whiskers = inside.groupby('Medicine')[QUANTITY].agg(lower='min', upper='max')
+    return stats.join(whiskers).reset_index()
+
+
+@st.cache_data(show_spinner=False)
+def _load_cube(mtime_ns, size):
+    histogram = build_quantity_histogram(load_data())
+    return cube_from_histogram(histogram), distribution_from_histogram(histogram)
+
+
+def load_cube():
+    """Return the cached (cube, medicine distribution) pair for the historical CSV."""
+    return _load_cube(*dataset_version())
 
-def show_explore_page():
+
+def explore_chart(plot_type, cube, distribution, medicines):
+    """Build the spec and bounded data of an Explore chart.
+
+    Returns ``(spec, data, number of medicines before the series cut)``.
+    """
+    filtered_cube = cube[cube['Medicine'].isin(medicines)]
+
+    if plot_type == 'Bar Chart':
+        data = filtered_cube.groupby('Medicine', as_index=False)['sum'].sum()
+        data = data.rename(columns={'sum': QUANTITY})
+        data, total = limit_series(data, ['Medicine'], QUANTITY)
+        chart = alt.Chart().mark_bar().encode(
+            x='Medicine:N',
+            y=f'{QUANTITY}:Q',
+            color='Medicine:N',
+            tooltip=['Medicine:N', f'{QUANTITY}:Q']
+        ).interactive()
+        columns, x, series = ['Medicine', QUANTITY], 'Medicine', ['Medicine']
+
+    elif plot_type == 'Line Plot':
+        data = filtered_cube.groupby(['Medicine', 'Month'], as_index=False)['sum'].sum()
+        data = data.rename(columns={'sum': QUANTITY})
+        data, total = limit_series(data, ['Medicine'], QUANTITY)
+        chart = alt.Chart().mark_line().encode(
+            x='Month:Q',
+            y=f'{QUANTITY}:Q',
+            color='Medicine:N',
+            tooltip=['Month:Q', 'Medicine:N', f'{QUANTITY}:Q']
+        ).interactive()
+        columns, x, series = ['Medicine', 'Month', QUANTITY], 'Month', ['Medicine']
+
+    elif plot_type == 'Box Plot':
+        data = distribution[distribution['Medicine'].isin(medicines)]
+        data, total = limit_series(data, ['Medicine'], 'median')
+        base = alt.Chart().encode(x='Medicine:N')
+        whiskers = base.mark_rule().encode(
+            y=alt.Y('lower:Q', title=QUANTITY),
+            y2='upper:Q'
+        )
+        boxes = base.mark_bar(size=20).encode(
+            y='q1:Q',
+            y2='q3:Q',
+            tooltip=['Medicine:N', 'lower:Q', 'q1:Q', 'median:Q', 'q3:Q', 'upper:Q']
+        )
+        medians = base.mark_tick(color='white', size=20).encode(y='median:Q')
+        chart = (whiskers + boxes + medians).interactive()
+        columns, x, series = ['Medicine', 'lower', 'q1', 'median', 'q3', 'upper'], 'Medicine', ['Medicine']
+
+    else:
+        data = filtered_cube.groupby(['Medicine', 'Season', 'Month'], as_index=False)[['sum', 'count']].sum()
+        data[QUANTITY] = data['sum'] / data['count']
+        data, total = limit_series(data, ['Medicine'], 'count')
+        chart = alt.Chart().mark_circle().encode(
+            x='Month:Q',
+            y=f'{QUANTITY}:Q',
+            color='Medicine:N',
+            size='Season:N',
+            tooltip=['Month:Q', 'Medicine:N', f'{QUANTITY}:Q', 'Season:N', 'count:Q']
+        ).interactive()
+        columns, x, series = ['Medicine', 'Season', 'Month', QUANTITY, 'count'], 'Month', ['Medicine', 'Season']
+
+    spec = chart_spec(chart)
+    return spec, fit_budget(spec, compact(data, columns), x, series), total
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _explore_chart(plot_type, medicines, version, _cube, _distribution):
+    return explore_chart(plot_type, _cube, _distribution, list(medicines))
+
+
+def show_explore_page(conn=None):
     st.title('Medicine Consumption Analysis')
 
+    # Prefer the live summary table kept current by the Medicines triggers;
+    # fall back to the historical CSV while the database is empty.
+    live_medicines = summary_medicines(conn) if conn is not None else []
+    if live_medicines:
+        medicines = live_medicines
+    else:
+        cube, distribution = load_cube()
+        medicines = cube['Medicine'].unique()
+
     # Data filters
-    selected_medicines = st.multiselect("Select Medicines", train_data['Medicine'].unique())
-    filtered_data = train_data[train_data['Medicine'].isin(selected_medicines)]
-
-    selected_plot_type = st.selectbox("Select Plot Type", ['Bar Chart', 'Line Plot', 'Box Plot', 'Scatter Plot'])
-
-    if selected_plot_type == 'Bar Chart':
-        st.subheader('Bar chart of Quantity(Packets) by Medicine')
-        bar_chart = alt.Chart(filtered_data).mark_bar().encode(
-            x='Medicine',
-            y='Quantity(Packets)',
-            color='Medicine',
-            tooltip=['Medicine', 'Quantity(Packets)']
-        ).configure(background='#045F5F').interactive()
-        st.altair_chart(bar_chart, use_container_width=True)
-
-    elif selected_plot_type == 'Line Plot':
-        st.subheader('Line Plot of Quantity(Packets) over Time')
-        line_chart = alt.Chart(filtered_data).mark_line().encode(
-            x='Month',
-            y='Quantity(Packets)',
-            color='Medicine',
-            tooltip=['Month', 'Medicine', 'Quantity(Packets)']
-        ).configure(background='#045F5F').interactive()
-        st.altair_chart(line_chart, use_container_width=True)
-
-    elif selected_plot_type == 'Box Plot':
-        st.subheader('Box Plot of Quantity(Packets) by Medicine')
-        box_plot = alt.Chart(filtered_data).mark_boxplot().encode(
-            x='Medicine',
-            y='Quantity(Packets)',
-            tooltip=['Medicine', 'Quantity(Packets)']
-        ).configure(background='#045F5F').interactive()
-        st.altair_chart(box_plot, use_container_width=True)
-
-    elif selected_plot_type == 'Scatter Plot':
-        st.subheader('Scatter Plot of Quantity(Packets) vs Season')
-        scatter_plot = alt.Chart(filtered_data).mark_circle().encode(
-            x='Month',
-            y='Quantity(Packets)',
-            color='Medicine',
-            size='Season',
-            tooltip=['Month', 'Medicine', 'Quantity(Packets)', 'Season']
-        ).configure(background='#045F5F').interactive()
-        st.altair_chart(scatter_plot, use_container_width=True)
+    selected_medicines = st.multiselect("Select Medicines", medicines)
+    if live_medicines:
+        histogram = read_monthly_quantities(conn, selected_medicines)
+        cube, distribution = cube_from_histogram(histogram), distribution_from_histogram(histogram)
+        version = int(pd.util.hash_pandas_object(histogram, index=False).sum())
+    else:
+        version = dataset_version()
+
+    selected_plot_type = st.selectbox("Select Plot Type", list(PLOT_TITLES))
+
+    # Specs and data are cached per selection, so reruns reuse them
+    spec, data, total = _explore_chart(selected_plot_type, tuple(sorted(selected_medicines)), version,
+                                       cube, distribution)
+    st.subheader(PLOT_TITLES[selected_plot_type])
+    if total > CHART_MAX_SERIES:
+        st.caption(f"Showing the {CHART_MAX_SERIES} medicines with the largest quantities of the {total} selected.")
+    st.vega_lite_chart(data, spec, width='stretch')
 
 
 def main():
@@ -0,0 +1,247 @@
+import bisect
+import math
+import threading
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from config import HISTORICAL_DATA_PATH
+from data_loader import dataset_version, load_historical_data
+from medicine_db import medicines_version, read_monthly_quantities, to_iso_date
+
+LAGS = (1, 2, 3, 6, 12)
+WINDOWS = (3, 6, 12)
+FEATURE_NAMES = (["Prev_Month_Quantity"] + [f"Lag_{lag}" for lag in LAGS]
+                 + [f"Rolling_{stat}_{window}" for window in WINDOWS for stat in ("Sum", "Mean", "Std")])
+
+
+def _period(year, month):
+    return int(year) * 12 + int(month) - 1
+
+
+def _year_month(period):
+    return period // 12, period % 12 + 1
+
+
+def _period_of(value):
+    """Month index of a date, datetime or date string."""
+    if not isinstance(value, (date, datetime)):
+        value = datetime.strptime(to_iso_date(value), "%Y-%m-%d")
+    return _period(value.year, value.month)
+
+
+class FeatureStore:
+    """Monthly quantity totals per medicine and per (medicine, disease),
+    with the lag and rolling-window features derived from them.
+
+    Recording a dispensed quantity adds it to its month's total in O(1).
+    Features for a month are read from at most ``max(WINDOWS)`` stored
+    totals, so lookups never touch raw rows and do not depend on the order
+    the rows were loaded in. Months without records count as zero.
+
+    ``Prev_Month_Quantity`` is the medicine's latest monthly total, which
+    is what the models were trained on (``train_pipeline.build_training_frame``).
+    """
+
+    def __init__(self):
+        self._totals = {}  # (medicine, disease or None) -> {period: quantity}
+        self._periods = {}  # (medicine, disease or None) -> sorted periods with records
+        self._latest = None
+        self.version = None  # MedicinesVersion the store reflects, for stores built from the database
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Build the store from historical rows (``Date`` parsed as datetime)."""
+        store = cls()
+        monthly = df.groupby(['Medicine', 'Disease', df['Date'].dt.year.rename('Year'),
+                              df['Date'].dt.month.rename('Month')])['Quantity(Packets)'].sum()
+        for (medicine, disease, year, month), quantity in monthly.items():
+            store.add(medicine, year, month, quantity, disease)
+        return store
+
+    @classmethod
+    def from_db(cls, conn):
+        """Build the store from the ``MedicineMonthlyQuantities`` summary table,
+        which the Medicines triggers keep current.
+
+        The summary and ``MedicinesVersion`` are read in one transaction, so
+        ``version`` matches the totals.
+        """
+        owns_transaction = not conn.in_transaction
+        if owns_transaction:
+            conn.execute("BEGIN")
+        try:
+            version = medicines_version(conn)
+            histogram = read_monthly_quantities(conn)
+        finally:
+            if owns_transaction:
+                conn.commit()
+        histogram = histogram.assign(Total=histogram['Quantity(Packets)'] * histogram['Records'])
+        monthly = histogram.groupby(['Medicine', 'Disease', 'Year', 'Month'])['Total'].sum()
+        store = cls()
+        for (medicine, disease, year, month), quantity in monthly.items():
+            store.add(medicine, year, month, quantity, disease or None)
+        store.version = version
+        return store
+
+    def sync(self, conn):
+        """Rebuild the store from the database if Medicines changed since ``version``."""
+        if medicines_version(conn) == self.version:
+            return self
+        fresh = FeatureStore.from_db(conn)
+        with self._lock:
+            self._totals, self._periods = fresh._totals, fresh._periods
+            self._latest, self.version = fresh._latest, fresh.version
+        return self
+
+    def add(self, medicine, year, month, quantity, disease=None):
+        """Add ``quantity`` to a month's totals; a negative quantity removes it."""
+        period = _period(year, month)
+        keys = [(medicine, None)] + ([(medicine, disease)] if disease is not None else [])
+        with self._lock:
+            for key in keys:
+                totals = self._totals.setdefault(key, {})
+                if period not in totals:
+                    periods = self._periods.setdefault(key, [])
+                    # Records mostly arrive in date order, so this is usually an append
+                    if not periods or period > periods[-1]:
+                        periods.append(period)
+                    else:
+                        bisect.insort(periods, period)
+                totals[period] = totals.get(period, 0) + quantity
+            if self._latest is None or period > self._latest:
+                self._latest = period
+
+    def record(self, medicine, quantity, date, disease=None, version=None):
+        """Register a newly dispensed quantity for a medicine on ``date``.
+
+        With ``version``, the ``MedicinesVersion`` read in the transaction
+        that inserted the row, the quantity is only added if that insert was
+        the one change since the store's version; otherwise the store is
+        left for ``sync`` to rebuild. Returns whether it was added.
+        """
+        with self._lock:
+            if version is not None:
+                if self.version is None or version != self.version + 1:
+                    return False
+                self.version = version
+            self.add(medicine, *_year_month(_period_of(date)), quantity, disease)
+            return True
+
+    def lag(self, medicine, disease=None, year=None, month=None):
+        """Return the latest monthly total of a medicine, 0 if it is unknown.
+
+        With ``(year, month)`` this is the latest total before that month,
+        found by binary search over the medicine's months.
+        """
+        key = (medicine, disease)
+        with self._lock:
+            periods = self._periods.get(key)
+            if not periods:
+                return 0
+            if year is None:
+                return self._totals[key][periods[-1]]
+            index = bisect.bisect_left(periods, _period(year, month))
+            return self._totals[key][periods[index - 1]] if index else 0
+
+    def history(self, medicine, disease=None, year=None, month=None, months=max(WINDOWS)):
+        """Return the monthly totals of the ``months`` months before
+        ``(year, month)`` (default ``reference_month()``), oldest first."""
+        if year is None:
+            year, month = self.reference_month() or (0, 1)
+        target = _period(year, month)
+        with self._lock:
+            totals = self._totals.get((medicine, disease), {})
+            return [totals.get(period, 0) for period in range(target - months, target)]
+
+    def reference_month(self):
+        """The month after the latest recorded one, as ``(year, month)``."""
+        return None if self._latest is None else _year_month(self._latest + 1)
+
+    def features(self, medicine, disease=None, year=None, month=None):
+        """Return ``{feature name: value}`` for a medicine in a month.
+
+        Lags and windows end at the month before ``(year, month)``, which
+        defaults to ``reference_month()``.
+        """
+        if year is None:
+            features = {"Prev_Month_Quantity": self.lag(medicine, disease)}
+            year, month = self.reference_month() or (0, 1)
+        else:
+            features = {"Prev_Month_Quantity": self.lag(medicine, disease, year, month)}
+        history = self.history(medicine, disease, year, month, max(LAGS + WINDOWS))
+
+        for lag in LAGS:
+            features[f"Lag_{lag}"] = history[-lag]
+        for window in WINDOWS:
+            values = history[-window:]
+            total = sum(values)
+            mean = total / window
+            features[f"Rolling_Sum_{window}"] = total
+            features[f"Rolling_Mean_{window}"] = mean
+            # Sample standard deviation, as pandas' rolling().std()
+            features[f"Rolling_Std_{window}"] = math.sqrt(sum((v - mean) ** 2 for v in values) / (window - 1))
+        return features
+
+    def frame(self, medicines, disease=None, year=None, month=None):
+        """Return the features of several medicines as a DataFrame indexed by medicine."""
+        return pd.DataFrame([self.features(medicine, disease, year, month) for medicine in medicines],
+                            index=pd.Index(medicines, name='Medicine'), columns=FEATURE_NAMES)
+
+    def __getstate__(self):
+        return {'_totals': {key: dict(totals) for key, totals in self._totals.items()},
+                '_periods': {key: list(periods) for key, periods in self._periods.items()},
+                '_latest': self._latest, 'version': self.version}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def __contains__(self, medicine):
+        return (medicine, None) in self._totals
+
+    def __len__(self):
+        return sum(1 for _, disease in self._totals if disease is None)
+
+
+@st.cache_resource(max_entries=4)
+def _load_feature_store(dataset_path, mtime_ns, size):
+    return FeatureStore.from_dataframe(load_historical_data(dataset_path))
+
+
+@st.cache_resource
+def _db_feature_store(database):
+    return FeatureStore()
+
+
+def _database(conn):
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def get_feature_store(dataset_path=HISTORICAL_DATA_PATH, conn=None):
+    """Return the process-wide feature store.
+
+    With ``conn``, this is the database's store, built from the summary
+    table while Medicines has rows. Rows inserted by this process are added
+    to it with ``record_insert``; any other change to Medicines makes the
+    next call rebuild it. Otherwise the store is built from the dataset and
+    rebuilt when the file changes, as ``load_historical_data`` is.
+    """
+    if conn is not None:
+        store = _db_feature_store(_database(conn)).sync(conn)
+        if len(store):
+            return store
+    path = Path(dataset_path).resolve()
+    return _load_feature_store(str(path), *dataset_version(path))
+
+
+def record_insert(conn, version, medicine, quantity, date, disease=None):
+    """Add a row just inserted into Medicines to the database's store in O(1).
+
+    ``version`` is ``medicines_version(conn)`` read in the inserting
+    transaction, after the insert.
+    """
+    return _db_feature_store(_database(conn)).record(medicine, quantity, date, disease, version)
@@ -0,0 +1,240 @@
+"""Schema, date normalization, write-path checks, indexes and summaries for Medicines.
+
+Run ``python medicine_db.py [database]`` to migrate a database and print
+the query plans of the common Records queries. Schema changes are applied
+through the versioned steps in ``migrations.py``.
+"""
+import sqlite3
+import sys
+from datetime import date, datetime
+
+import pandas as pd
+
+from perf_metrics import perf
+
+MEDICINES_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS Medicines (
+                          id INTEGER PRIMARY KEY AUTOINCREMENT,
+                          "Patient Name" TEXT NOT NULL,
+                          "Medicine" TEXT,
+                          "Disease" TEXT,
+                          "Variety" TEXT,
+                          "Quantity(Packets)" INTEGER NOT NULL,
+                          "Date" DATE NOT NULL,
+                          "Season" TEXT
+                          )'''
+MEDICINES_COLUMNS = ("Patient Name", "Medicine", "Disease", "Variety", "Quantity(Packets)", "Date", "Season")
+
+ISO_DATE_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]"
+ACCEPTED_DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%Y-%m-%d %H:%M:%S", "%m-%d-%Y")
+
+# Created by migration 2, which has already run on deployed databases. Add
+# new indexes through a new migration rather than here.
+MEDICINES_INDEXES = {
+    "idx_medicines_medicine": '"Medicine"',
+    "idx_medicines_disease": '"Disease"',
+    "idx_medicines_date": '"Date"',
+    "idx_medicines_medicine_date": '"Medicine", "Date"',
+}
+# Lets bulk_import's duplicate check seek straight to candidate rows (migration 6)
+IMPORT_DEDUPE_INDEXES = {
+    "idx_medicines_import_dedupe": '"Medicine", "Date", "Patient Name"',
+}
+
+# Monthly quantity histogram per medicine, disease and season. Triggers keep
+# it current on every insert, update and delete, so analytics read
+# O(result size) rows instead of re-aggregating the whole history.
+SUMMARY_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS MedicineMonthlyQuantities (
+                         "Medicine" TEXT NOT NULL,
+                         "Disease" TEXT NOT NULL,
+                         "Season" TEXT NOT NULL,
+                         "Year" INTEGER NOT NULL,
+                         "Month" INTEGER NOT NULL,
+                         "Quantity(Packets)" INTEGER NOT NULL,
+                         "Records" INTEGER NOT NULL,
+                         PRIMARY KEY ("Medicine", "Disease", "Season", "Year", "Month", "Quantity(Packets)")
+                         )'''
+SUMMARY_KEY_COLUMNS = ("Medicine", "Disease", "Season", "Year", "Month", "Quantity(Packets)")
+
+def _summary_key(row):
+    """SQL expressions for the summary key of the NEW/OLD row in a trigger."""
+    return (
+        f'COALESCE({row}."Medicine", \'\')', f'COALESCE({row}."Disease", \'\')',
+        f'COALESCE({row}."Season", \'\')',
+        f'CAST(substr({row}."Date", 1, 4) AS INTEGER)', f'CAST(substr({row}."Date", 6, 2) AS INTEGER)',
+        f'{row}."Quantity(Packets)"',
+    )
+
+def _summary_add_sql(row):
+    return (f'INSERT INTO MedicineMonthlyQuantities VALUES ({", ".join(_summary_key(row))}, 1) '
+            f'ON CONFLICT DO UPDATE SET "Records" = "Records" + 1;')
+
+def _summary_remove_sql(row):
+    match = " AND ".join(f'"{column}" = {value}' for column, value in zip(SUMMARY_KEY_COLUMNS, _summary_key(row)))
+    return (f'UPDATE MedicineMonthlyQuantities SET "Records" = "Records" - 1 WHERE {match}; '
+            f'DELETE FROM MedicineMonthlyQuantities WHERE {match} AND "Records" <= 0;')
+
+# Queries the app runs against Medicines, with sample parameters
+COMMON_QUERIES = {
+    "filter by medicine": ('SELECT rowid, * FROM Medicines WHERE "Medicine" IN (?) ORDER BY rowid LIMIT 10', ("Paracetamol",)),
+    "filter by disease": ('SELECT COUNT(*) FROM Medicines WHERE "Disease" IN (?)', ("Fever",)),
+    "date range": ('SELECT COUNT(*) FROM Medicines WHERE "Date" >= ? AND "Date" <= ?', ("2021-01-01", "2021-12-31")),
+    "medicine history": ('SELECT "Date", "Quantity(Packets)" FROM Medicines WHERE "Medicine" = ? ORDER BY "Date"', ("Paracetamol",)),
+    "medicine in date range": ('SELECT COUNT(*) FROM Medicines WHERE "Medicine" = ? AND "Date" >= ?', ("Paracetamol", "2021-06-01")),
+}
+
+
+def to_iso_date(value):
+    """Return ``value`` (a date, datetime or date string) as ``YYYY-MM-DD``.
+
+    Raises ``ValueError`` for strings in an unrecognised format.
+    """
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = str(value).strip()
+    for fmt in ACCEPTED_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {value!r}")
+
+
+def normalize_medicine_dates(conn):
+    """Rewrite every non-ISO ``Date`` in Medicines to ``YYYY-MM-DD``.
+
+    Returns the number of rewritten rows.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT rowid, "Date" FROM Medicines WHERE "Date" NOT GLOB ?', (ISO_DATE_GLOB,))
+    updates = [(to_iso_date(value), rowid) for rowid, value in cursor.fetchall()]
+    cursor.executemany('UPDATE Medicines SET "Date" = ? WHERE rowid = ?', updates)
+    return len(updates)
+
+
+def create_medicines_indexes(conn, indexes=MEDICINES_INDEXES):
+    cursor = conn.cursor()
+    for name, columns in indexes.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON Medicines ({columns})")
+
+
+def create_import_dedupe_index(conn):
+    create_medicines_indexes(conn, IMPORT_DEDUPE_INDEXES)
+
+
+def create_iso_date_triggers(conn):
+    """Reject inserts and updates whose ``Date`` is not ``YYYY-MM-DD``."""
+    cursor = conn.cursor()
+    for event in ("INSERT", 'UPDATE OF "Date"'):
+        name = "medicines_iso_date_" + event.split()[0].lower()
+        cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS {name}
+                           BEFORE {event} ON Medicines
+                           WHEN NEW."Date" NOT GLOB '{ISO_DATE_GLOB}'
+                           BEGIN
+                               SELECT RAISE(ABORT, 'Date must be in YYYY-MM-DD format');
+                           END''')
+
+
+def create_summary_tables(conn):
+    """Create the monthly summary table, backfill it and add its triggers."""
+    cursor = conn.cursor()
+    cursor.execute(SUMMARY_TABLE_SQL)
+    key = ", ".join(_summary_key("m"))
+    cursor.execute("DELETE FROM MedicineMonthlyQuantities")
+    cursor.execute(f'INSERT INTO MedicineMonthlyQuantities SELECT {key}, COUNT(*) FROM Medicines AS m GROUP BY {key}')
+    triggers = {
+        "medicines_summary_insert": ("AFTER INSERT", _summary_add_sql("NEW")),
+        "medicines_summary_delete": ("AFTER DELETE", _summary_remove_sql("OLD")),
+        "medicines_summary_update": ("AFTER UPDATE", _summary_remove_sql("OLD") + " " + _summary_add_sql("NEW")),
+    }
+    for name, (event, body) in triggers.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} ON Medicines BEGIN {body} END")
+
+
+def create_version_counter(conn):
+    """Create the ``MedicinesVersion`` counter, bumped by every write to Medicines."""
+    cursor = conn.cursor()
+    cursor.execute('CREATE TABLE IF NOT EXISTS MedicinesVersion ("version" INTEGER NOT NULL)')
+    if cursor.execute("SELECT COUNT(*) FROM MedicinesVersion").fetchone()[0] == 0:
+        cursor.execute("INSERT INTO MedicinesVersion VALUES (0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS medicines_version_{event.lower()}
+                           AFTER {event} ON Medicines
+                           BEGIN
+                               UPDATE MedicinesVersion SET "version" = "version" + 1;
+                           END''')
+
+
+def enforce_iso_dates(conn):
+    """Normalize stored dates, then add the ISO date triggers and the indexes."""
+    normalize_medicine_dates(conn)
+    create_iso_date_triggers(conn)
+    create_medicines_indexes(conn)
+
+
+def medicines_version(conn):
+    """Return a counter that changes whenever Medicines, and so the summary table, changes."""
+    return conn.execute('SELECT "version" FROM MedicinesVersion').fetchone()[0]
+
+
+@perf.timed("sqlite.summary_medicines")
+def summary_medicines(conn):
+    """Return the medicines present in the summary table."""
+    cursor = conn.cursor()
+    cursor.execute('SELECT DISTINCT "Medicine" FROM MedicineMonthlyQuantities ORDER BY 1')
+    return [row[0] for row in cursor.fetchall()]
+
+
+@perf.timed("sqlite.summary_medicine_diseases")
+def summary_medicine_diseases(conn):
+    """Return ``{medicine: [diseases]}`` from the summary table."""
+    cursor = conn.cursor()
+    cursor.execute('SELECT DISTINCT "Medicine", "Disease" FROM MedicineMonthlyQuantities ORDER BY 1, 2')
+    medicine_diseases = {}
+    for medicine, disease in cursor.fetchall():
+        medicine_diseases.setdefault(medicine, []).append(disease)
+    return medicine_diseases
+
+
+@perf.timed("sqlite.read_monthly_quantities")
+def read_monthly_quantities(conn, medicines=None):
+    """Return the summary histogram as a DataFrame, optionally for some medicines."""
+    sql = "SELECT * FROM MedicineMonthlyQuantities"
+    params = ()
+    if medicines is not None:
+        sql += f' WHERE "Medicine" IN ({", ".join("?" * len(medicines))})'
+        params = tuple(medicines)
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    columns = [description[0] for description in cursor.description]
+    return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+
+def explain_query_plan(conn, sql, params=()):
+    """Return the ``EXPLAIN QUERY PLAN`` detail lines for a query."""
+    cursor = conn.cursor()
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    return [row[-1] for row in cursor.fetchall()]
+
+
+def check_common_queries(conn):
+    """Return ``{query name: plan}`` for every common query that scans Medicines."""
+    full_scans = {}
+    for name, (sql, params) in COMMON_QUERIES.items():
+        plan = explain_query_plan(conn, sql, params)
+        if any(line.startswith("SCAN") and "INDEX" not in line for line in plan):
+            full_scans[name] = plan
+    return full_scans
+
+
+if __name__ == '__main__':
+    from migrations import apply_migrations, MEDICINES_MIGRATIONS
+
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else "Historical_Data_Medicine.db")
+    apply_migrations(conn, MEDICINES_MIGRATIONS)
+    for name, (sql, params) in COMMON_QUERIES.items():
+        print(f"{name}: {'; '.join(explain_query_plan(conn, sql, params))}")
+    full_scans = check_common_queries(conn)
+    if full_scans:
+        sys.exit(f"Full table scans: {', '.join(full_scans)}")
@@ -0,0 +1,129 @@
+"""Versioned schema migrations for the users and Medicines databases.
+
+Each database records the migrations applied to it in a ``schema_version``
+table. The app applies pending migrations once per process, when it opens
+a connection. Deployments can apply them ahead of time with::
+
+    python migrations.py --users users.db --medicines Historical_Data_Medicine.db
+"""
+import argparse
+import sqlite3
+from datetime import datetime
+
+from medicine_db import (MEDICINES_TABLE_SQL, create_import_dedupe_index, create_summary_tables, create_version_counter,
+                         enforce_iso_dates)
+from prediction_log import create_predictions_table
+from user_provisioning import hash_password
+
+DEFAULT_USER = ("Tedros", "pass123")
+
+USERS_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS users (
+                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     username TEXT NOT NULL UNIQUE,
+                     password TEXT NOT NULL
+                     )'''
+
+
+def _table_columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")').fetchall()]
+
+
+def create_users_table(conn):
+    conn.execute(USERS_TABLE_SQL)
+
+
+def reconcile_users_schema(conn):
+    """Rebuild a ``users`` table created by ``database.py`` (username as the
+    primary key) into the app's schema with an ``id`` key and unique usernames."""
+    if "id" in _table_columns(conn, "users"):
+        return
+    conn.execute("ALTER TABLE users RENAME TO users_old")
+    conn.execute(USERS_TABLE_SQL)
+    conn.execute("INSERT INTO users (username, password) SELECT username, password FROM users_old")
+    conn.execute("DROP TABLE users_old")
+
+
+def seed_default_user(conn):
+    username, password = DEFAULT_USER
+    if conn.execute("SELECT 1 FROM users WHERE username=?", (username,)).fetchone() is None:
+        conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hash_password(password)))
+
+
+def create_medicines_table(conn):
+    conn.execute(MEDICINES_TABLE_SQL)
+
+
+# (version, description, step). Steps must tolerate databases that were
+# created before schema_version existed.
+USERS_MIGRATIONS = [
+    (1, "create users table", create_users_table),
+    (2, "reconcile users schema with database.py", reconcile_users_schema),
+    (3, "seed default user", seed_default_user),
+]
+
+MEDICINES_MIGRATIONS = [
+    (1, "create Medicines table", create_medicines_table),
+    (2, "ISO-8601 dates, date triggers and indexes", enforce_iso_dates),
+    (3, "monthly summary table and triggers", create_summary_tables),
+    (4, "predictions audit log", create_predictions_table),
+    (5, "Medicines change counter", create_version_counter),
+    (6, "bulk import dedupe index", create_import_dedupe_index),
+]
+
+MIGRATIONS = {
+    "users": USERS_MIGRATIONS,
+    "medicines": MEDICINES_MIGRATIONS,
+}
+
+
+def schema_version(conn):
+    """Return the highest applied migration version, 0 for a fresh database."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TEXT NOT NULL
+                    )''')
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def apply_migrations(conn, migrations):
+    """Apply every pending migration, each in its own transaction.
+
+    Each step runs under ``BEGIN IMMEDIATE`` and re-reads the schema
+    version first, so when several processes start together one applies
+    the step and the others skip it once it is committed.
+
+    Returns the versions that were applied.
+    """
+    if schema_version(conn) >= max(version for version, _, _ in migrations):
+        return []
+    applied = []
+    for version, description, step in migrations:
+        # Take the write lock before reading the version, and keep DDL in
+        # the transaction so it is rolled back with the rest of a failed step
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version <= schema_version(conn):
+                conn.rollback()
+                continue
+            step(conn)
+            conn.execute("INSERT INTO schema_version VALUES (?, ?, ?)",
+                         (version, description, datetime.now().isoformat(timespec="seconds")))
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        applied.append(version)
+    return applied
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument("--users", default="users.db", help="users database")
+    parser.add_argument("--medicines", default="Historical_Data_Medicine.db", help="Medicines database")
+    args = parser.parse_args()
+    for schema, db_file in (("users", args.users), ("medicines", args.medicines)):
+        conn = sqlite3.connect(db_file)
+        applied = apply_migrations(conn, MIGRATIONS[schema])
+        print(f"{db_file}: schema version {schema_version(conn)} (applied {applied or 'nothing'})")
+        conn.close()
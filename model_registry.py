@@ -0,0 +1,104 @@
+import json
+import threading
+from pathlib import Path
+
+import joblib
+
+from config import BAKEOFF_REPORT
+from perf_metrics import perf
+from tree_engine import CompiledForest
+
+
+def load_artifact(path, mmap_mode=None):
+    """Load a joblib artifact, or a compiled tree model for ``.npz`` files."""
+    if Path(path).suffix == ".npz":
+        return CompiledForest.load(path)
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+def compiled_or_original(path):
+    """Return the compiled ``.npz`` next to a model pickle if it is at least
+    as new as the pickle, otherwise ``path`` itself."""
+    path = Path(path)
+    compiled = path.with_suffix(".npz")
+    try:
+        if compiled != path and compiled.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            return compiled
+    except FileNotFoundError:
+        pass
+    return path
+
+
+def artifact_metadata(path):
+    """Return the training metadata written next to a model by
+    ``train_pipeline.py --promote`` (``<name>.json``), or None."""
+    metadata_path = Path(path).with_suffix(".json")
+    try:
+        return json.loads(metadata_path.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def champion_artifacts(report_path=BAKEOFF_REPORT):
+    """Return ``(model_path, feature_columns_path)`` of the champion in a
+    ``bakeoff.py`` report, or None if there is no usable champion."""
+    try:
+        champion = json.loads(Path(report_path).read_text())["champion"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+    if not champion:
+        return None
+    paths = Path(champion["model_path"]), Path(champion["feature_columns_path"])
+    return paths if all(path.exists() for path in paths) else None
+
+
+def artifact_version(path):
+    """Return the version tag of an artifact file, derived from its mtime and size."""
+    path = Path(path)
+    stat = path.stat()
+    return f"{path.name}@{stat.st_mtime_ns}-{stat.st_size}"
+
+
+class ModelRegistry:
+    """Process-wide cache of joblib artifacts (models, feature column lists).
+
+    Each artifact is deserialized once per process and served from memory
+    until its file changes on disk, at which point the next ``get`` loads
+    the new file in its place. Loading with ``mmap_mode`` maps the NumPy
+    arrays stored in joblib pickles read-only from the file, so server
+    workers on the same host share those pages through the OS page cache.
+    """
+
+    def __init__(self, mmap_mode='r'):
+        self.mmap_mode = mmap_mode
+        self._artifacts = {}  # resolved path -> (version, artifact)
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """Return ``(artifact, version)``, reloading it if the file changed.
+
+        Raises ``FileNotFoundError`` if the artifact does not exist.
+        """
+        path = Path(path).resolve()
+        version = artifact_version(path)
+        entry = self._artifacts.get(path)
+        if entry is None or entry[0] != version:
+            with self._lock:
+                entry = self._artifacts.get(path)
+                if entry is None or entry[0] != version:
+                    with perf.timer("artifact.load"):
+                        entry = (version, load_artifact(path, self.mmap_mode))
+                    self._artifacts[path] = entry
+        return entry[1], entry[0]
+
+    def version(self, path):
+        """Return the version of the loaded artifact, or None if it is not loaded."""
+        entry = self._artifacts.get(Path(path).resolve())
+        return entry[0] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._artifacts.clear()
+
+
+registry = ModelRegistry()
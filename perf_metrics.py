@@ -0,0 +1,232 @@
+"""In-process latency histograms and counters for the app's hot paths.
+
+Code paths are timed with the process-wide ``perf`` instance::
+
+    with perf.timer("model.predict"):
+        model.predict(X)
+
+    @perf.timed("sqlite.count_records")
+    def count_records(conn, ...): ...
+
+Each measurement is labelled with the operation and with the page being
+rendered (set by ``with perf.page("Predict"):`` in ``app.py``). The data
+is shown on the admin Performance page and written to a Prometheus text
+file that node_exporter's textfile collector or a plain scrape can read.
+"""
+import contextvars
+import functools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from config import METRICS_FILE
+
+# Upper bounds in seconds; SQLite lookups are sub-millisecond, CSV parses
+# and model loads can take seconds.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WRITE_INTERVAL_SECONDS = 15
+
+_current_page = contextvars.ContextVar("page", default="")
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.errors = 0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def cumulative(self):
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket, like PromQL's
+        histogram_quantile, clamped to the observed min and max."""
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for bound, count in zip(self.buckets, self.counts):
+            if seen + count >= rank and count:
+                estimate = lower + (bound - lower) * (rank - seen) / count
+                return min(max(estimate, self.min), self.max)
+            seen += count
+            lower = bound
+        return self.max
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+class PerfMetrics:
+    """Thread-safe registry of per-page, per-operation histograms and event counters."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.started_at = time.time()
+        self._histograms = {}  # (page, operation) -> Histogram
+        self._counters = {}    # (page, event) -> count
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    @contextmanager
+    def page(self, name):
+        """Label everything timed inside the block with page ``name`` and time the block as ``page.render``."""
+        token = _current_page.set(name)
+        try:
+            with self.timer("page.render"):
+                yield
+        finally:
+            _current_page.reset(token)
+
+    def observe(self, operation, seconds, error=False):
+        key = (_current_page.get(), operation)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            if error:
+                histogram.errors += 1
+
+    @contextmanager
+    def timer(self, operation):
+        """Time the block. An ``Exception`` also counts as an error; Streamlit's
+        rerun/stop signals derive from ``BaseException`` and do not."""
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.observe(operation, time.perf_counter() - start, error)
+
+    def timed(self, operation):
+        """Decorator form of ``timer``."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(operation):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def increment(self, event, amount=1):
+        key = (_current_page.get(), event)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def snapshot(self):
+        """Return one summary dict per (page, operation), slowest total first."""
+        with self._lock:
+            items = list(self._histograms.items())
+            rows = []
+            for (page, operation), histogram in items:
+                rows.append({
+                    "page": page,
+                    "operation": operation,
+                    "count": histogram.count,
+                    "errors": histogram.errors,
+                    "total_s": histogram.sum,
+                    "mean_ms": histogram.sum / histogram.count * 1000,
+                    "p50_ms": histogram.quantile(0.5) * 1000,
+                    "p95_ms": histogram.quantile(0.95) * 1000,
+                    "p99_ms": histogram.quantile(0.99) * 1000,
+                })
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+    def counters(self):
+        """Return ``{(page, event): count}``."""
+        with self._lock:
+            return dict(self._counters)
+
+    def prometheus_text(self):
+        """Render every histogram and counter in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            lines = [
+                "# HELP app_operation_duration_seconds Latency of instrumented operations.",
+                "# TYPE app_operation_duration_seconds histogram",
+            ]
+            for (page, operation), histogram in histograms:
+                labels = _labels(page=page, operation=operation)
+                bounds = [repr(float(bound)) for bound in histogram.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, histogram.cumulative()):
+                    lines.append(f'app_operation_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"app_operation_duration_seconds_sum{{{labels}}} {histogram.sum!r}")
+                lines.append(f"app_operation_duration_seconds_count{{{labels}}} {histogram.count}")
+
+            lines += ["# HELP app_operation_errors_total Instrumented operations that raised.",
+                      "# TYPE app_operation_errors_total counter"]
+            for (page, operation), histogram in histograms:
+                lines.append(f"app_operation_errors_total{{{_labels(page=page, operation=operation)}}} {histogram.errors}")
+
+            lines += ["# HELP app_events_total Counted application events.",
+                      "# TYPE app_events_total counter"]
+            for (page, event), count in counters:
+                lines.append(f"app_events_total{{{_labels(page=page, event=event)}}} {count}")
+
+        lines += ["# HELP app_start_time_seconds Unix time the metrics were reset.",
+                  "# TYPE app_start_time_seconds gauge",
+                  f"app_start_time_seconds {self.started_at!r}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=METRICS_FILE):
+        """Atomically write the Prometheus text file."""
+        path = os.fspath(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+        self._last_write = time.monotonic()
+
+    def maybe_write_prometheus(self, path=METRICS_FILE, interval=WRITE_INTERVAL_SECONDS):
+        """Write the text file if the last write is older than ``interval`` seconds."""
+        if time.monotonic() - self._last_write < interval:
+            return
+        try:
+            self.write_prometheus(path)
+        except OSError:
+            # Metrics export must never break a page render
+            self._last_write = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+
+perf = PerfMetrics()
@@ -0,0 +1,79 @@
+import json
+
+import streamlit as st
+import pandas as pd
+import altair as alt
+from datetime import datetime
+
+from config import BAKEOFF_REPORT, METRICS_FILE
+from perf_metrics import perf
+from prediction_cache import prediction_cache
+from prediction_log import prediction_log
+
+# Admin page with the latency histograms and counters recorded by perf_metrics
+def show_performance_page():
+    st.title("Performance")
+    st.caption(f"Recording since {datetime.fromtimestamp(perf.started_at):%Y-%m-%d %H:%M:%S} "
+               f"in this server process. Metrics file: {METRICS_FILE}")
+
+    rows = perf.snapshot()
+    if not rows:
+        st.write("No measurements yet. Use the other pages and come back.")
+    else:
+        df = pd.DataFrame(rows)
+        df["page"] = df["page"].replace("", "(none)")
+
+        st.subheader("Where time goes")
+        totals = df.groupby("operation", as_index=False)["total_s"].sum()
+        chart = alt.Chart(totals).mark_bar().encode(
+            x=alt.X("total_s:Q", title="Total time (s)"),
+            y=alt.Y("operation:N", sort="-x", title=None),
+            tooltip=["operation", alt.Tooltip("total_s:Q", format=".3f")]
+        )
+        st.altair_chart(chart, use_container_width=True)
+
+        st.subheader("Latency by page and operation")
+        st.dataframe(df.round({"total_s": 3, "mean_ms": 2, "p50_ms": 2, "p95_ms": 2, "p99_ms": 2}),
+                     hide_index=True, use_container_width=True)
+        st.caption("Percentiles are estimated from histogram buckets.")
+
+    counters = perf.counters()
+    if counters:
+        st.subheader("Counters")
+        st.dataframe(pd.DataFrame(
+            [{"page": page or "(none)", "event": event, "count": count} for (page, event), count in counters.items()]
+        ), hide_index=True)
+
+    st.subheader("Prediction cache")
+    st.json(prediction_cache.stats())
+
+    st.subheader("Prediction log")
+    st.json(prediction_log.stats())
+
+    if BAKEOFF_REPORT.exists():
+        report = json.loads(BAKEOFF_REPORT.read_text())
+        champion = report["champion"]
+        st.subheader("Model bake-off")
+        st.caption(f"Run {report['generated_at']} on {report['holdout_months']} months from "
+                   f"{report['holdout_start']}. Predict page champion: "
+                   f"{champion['model'] if champion else 'none'} (by {report['metric']}).")
+        results = pd.DataFrame(report["results"])
+        columns = ["task", "model", "feature_columns", "status", "mae", "rmse", "r2",
+                   "batch_ms", "single_row_ms", "load_ms", "memory_bytes", "app_servable"]
+        st.dataframe(results.reindex(columns=columns).round(3), hide_index=True, use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Write metrics file"):
+            try:
+                perf.write_prometheus()
+                st.success(f"Wrote {METRICS_FILE}")
+            except OSError as e:
+                st.error(f"Could not write metrics file: {e}")
+    with col2:
+        st.download_button("Download Prometheus metrics", perf.prometheus_text(),
+                           file_name="metrics.prom", mime="text/plain")
+
+    if st.button("Reset measurements"):
+        perf.reset()
+        st.rerun()
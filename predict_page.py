@@ -4,38 +4,78 @@ import pickle
 import streamlit as st
 import altair as alt
 import joblib
+import time
+import uuid
+from datetime import datetime
+
+from charts import chart_spec, compact, fit_budget, limit_series
+from config import CHART_MAX_SERIES
+from data_loader import dataset_version, load_historical_data
+from feature_store import LAGS, WINDOWS, get_feature_store
+from medicine_db import summary_medicine_diseases
+from model_registry import artifact_metadata, champion_artifacts, compiled_or_original, registry
+from prediction_cache import prediction_cache
+from prediction_log import prediction_log
+
+DEFAULT_MODEL_PATH = 'Model/best_rf_model.pkl'
+DEFAULT_FEATURE_COLUMNS_PATH = 'Model/feature_columns.pkl'
+# Longest recursive forecast the page runs; each month is one sequential predict call
+MAX_RECURSIVE_MONTHS = 60
 
 # Load the model and feature columns
 def load_model(model_path):
     try:
-        with open(model_path, "rb") as file:
-            return joblib.load(file)
+        return registry.get(model_path)[0]
     except FileNotFoundError:
         st.error(f"Model file not found at: {model_path}")
         return None
 
 def load_feature_columns(feature_columns_path):
     try:
-        with open(feature_columns_path, "rb") as file:
-            return joblib.load(file)
+        return registry.get(feature_columns_path)[0]
     except FileNotFoundError:
         st.error(f"Feature columns file not found at: {feature_columns_path}")
         return None
 
+@st.cache_data(show_spinner=False)
+def trend_spec():
+    """Vega-Lite spec of the predicted trend chart; the data is sent separately."""
+    return chart_spec(alt.Chart().mark_line().encode(
+        x='Month:Q',
+        y='Predicted Quantity:Q',
+        color='Medicine_Disease:N',
+        tooltip=['Month:Q', 'Medicine_Disease:N', 'Predicted Quantity:Q']
+    ).properties(
+        width=800,
+        height=400
+    ).interactive())
+
+MONTH_MAP = {
+    "January": 1, "February": 2, "March": 3, "April": 4,
+    "May": 5, "June": 6, "July": 7, "August": 8,
+    "September": 9, "October": 10, "November": 11, "December": 12
+}
+
+def get_prev_quantity(medicine, df, feature_store=None):
+    """Return the medicine's latest monthly total, the Prev_Month_Quantity feature.
+
+    With a ``feature_store`` this is an O(1) lookup; otherwise the medicine's
+    rows are scanned in ``df``.
+    """
+    if feature_store is not None:
+        return feature_store.lag(medicine)
+    medicine_df = df[df['Medicine'] == medicine]
+    monthly = medicine_df.groupby(medicine_df['Date'].dt.to_period('M'))['Quantity(Packets)'].sum()
+    return monthly.iloc[-1] if len(monthly) else 0
+
 # Preprocess input for prediction
-def preprocess_input(Year, Month, Medicines, Season, feature_columns, df):
-    month_map = {
-        "January": 1, "February": 2, "March": 3, "April": 4,
-        "May": 5, "June": 6, "July": 7, "August": 8,
-        "September": 9, "October": 10, "November": 11, "December": 12
-    }
-    month_numeric = month_map.get(Month, 0)  # Default to 0 if month is invalid
+def preprocess_input(Year, Month, Medicines, Season, feature_columns, df, feature_store=None):
+    month_numeric = MONTH_MAP.get(Month, 0)  # Default to 0 if month is invalid
 
     input_data = []
     for medicine in Medicines:
         # Get the most recent quantity data for the selected medicine
-        medicine_df = df[df['Medicine'] == medicine]
-        prev_quantity = medicine_df['Quantity(Packets)'].shift(1).fillna(0).values[-1]
+        prev_quantity = get_prev_quantity(medicine, df, feature_store)
         
         # Prepare the input features in the correct order
         features = [
@@ -56,18 +96,117 @@ def preprocess_input(Year, Month, Medicines, Season, feature_columns, df):
     
     return np.array(input_data)
 
+def preprocess_batch(Year, months, Medicines, Season, feature_columns, df, feature_store=None):
+    """Build the design matrix for every (medicine, month) pair at once.
+
+    ``months`` holds month numbers (1-12). Rows are medicine-major, so row
+    ``i * len(months) + j`` is ``Medicines[i]`` in ``months[j]`` and equals
+    the row ``preprocess_input`` builds for that medicine and month.
+    """
+    months = np.asarray(months, dtype=float)
+    prev_quantities = np.array([get_prev_quantity(medicine, df, feature_store) for medicine in Medicines], dtype=float)
+
+    input_data = np.zeros((len(Medicines) * len(months), len(feature_columns)))
+    input_data[:, 0] = Year
+    input_data[:, 1] = np.tile(months, len(Medicines))
+    input_data[:, 2] = np.repeat(prev_quantities, len(months))
+
+    if f'Season_{Season}' in feature_columns:
+        input_data[:, feature_columns.index(f'Season_{Season}')] = 1
+
+    return input_data
+
+def forecast_recursive(predict, Year, Month, horizon, Medicines, Season, feature_columns, feature_store):
+    """Forecast ``horizon`` consecutive months from ``(Year, Month)``, feeding
+    each month's predictions back in as the next month's lag features.
+
+    ``predict`` maps a design matrix to predictions (``model.predict`` or a
+    cached wrapper). All medicines are scored together, so the horizon
+    costs ``horizon`` batched calls. The lag and rolling-window columns of
+    ``feature_store.FEATURE_NAMES`` start from the store's history before
+    ``(Year, Month)``. Returns an array of shape ``(len(Medicines), horizon)``.
+    """
+    n_history = max(LAGS + WINDOWS)
+    history = np.zeros((len(Medicines), n_history + horizon))
+    history[:, :n_history] = [feature_store.history(medicine, None, Year, Month, n_history) for medicine in Medicines]
+    prev_quantities = np.array([feature_store.lag(medicine, None, Year, Month) for medicine in Medicines], dtype=float)
+
+    input_data = np.zeros((len(Medicines), len(feature_columns)))
+    if f'Season_{Season}' in feature_columns:
+        input_data[:, feature_columns.index(f'Season_{Season}')] = 1
+
+    start = Year * 12 + Month - 1
+    for step in range(horizon):
+        now = n_history + step
+        for i, column in enumerate(feature_columns):
+            if column == 'Year':
+                input_data[:, i] = (start + step) // 12
+            elif column == 'Month':
+                input_data[:, i] = (start + step) % 12 + 1
+            elif column == 'Prev_Month_Quantity':
+                input_data[:, i] = prev_quantities
+            elif column.startswith('Lag_'):
+                input_data[:, i] = history[:, now - int(column[len('Lag_'):])]
+            elif column.startswith('Rolling_'):
+                stat, window = column[len('Rolling_'):].split('_')
+                values = history[:, now - int(window):now]
+                if stat == 'Sum':
+                    input_data[:, i] = values.sum(axis=1)
+                elif stat == 'Mean':
+                    input_data[:, i] = values.mean(axis=1)
+                else:
+                    input_data[:, i] = values.std(axis=1, ddof=1)
+        prev_quantities = np.asarray(predict(input_data.copy()), dtype=float)
+        history[:, now] = prev_quantities
 
-def show_predict_page(model_path='Model/best_rf_model.pkl', feature_columns_path='Model/feature_columns.pkl', dataset_path="Historical_Data_7_Aug_2024.csv"):
+    return history[:, n_history:]
+
+
+def log_predictions(Year, Medicines, Season, mode, feature_columns, input_data, predictions, model_version, latency_ms):
+    """Queue one audit row per medicine and month for the background prediction log.
+
+    ``input_data`` has shape ``(len(Medicines), 12, len(feature_columns))``
+    and ``predictions`` has shape ``(len(Medicines), 12)``.
+    """
+    request_id = uuid.uuid4().hex
+    created_at = datetime.now().isoformat(timespec="seconds")
+    username = st.session_state.get("user")
+    prediction_log.log([
+        (created_at, request_id, username, medicine, int(Year), month, Season, mode,
+         dict(zip(feature_columns, input_data[i, month - 1].tolist())), model_version,
+         float(predictions[i, month - 1]), latency_ms)
+        for i, medicine in enumerate(Medicines) for month in range(1, 13)
+    ])
+
+
+def show_predict_page(model_path=None, feature_columns_path=None, dataset_path="Historical_Data_7_Aug_2024.csv", conn=None):
     st.title('Medicine Quantity Prediction')
     st.write('Please fill in the following details to predict the quantity of medicine needed.')
 
+    # Without an explicit model, serve the champion of the last bake-off (see bakeoff.py);
+    # explicitly passed feature columns are kept
+    if model_path is None:
+        model_path, champion_columns = champion_artifacts() or (DEFAULT_MODEL_PATH, DEFAULT_FEATURE_COLUMNS_PATH)
+        if feature_columns_path is None:
+            feature_columns_path = champion_columns
+    if feature_columns_path is None:
+        feature_columns_path = DEFAULT_FEATURE_COLUMNS_PATH
+
+    # Prefer an up-to-date compiled copy of the model (see tree_engine.py)
+    model_path = compiled_or_original(model_path)
+
     # Load the dataset and feature columns
-    df = pd.read_csv(dataset_path)
-    df['Date'] = pd.to_datetime(df['Date'], format='%m/%d/%Y')
-    df['YearMonth'] = df['Date'].dt.to_period('M')
+    df = load_historical_data(dataset_path)
 
-    unique_medicines = df['Medicine'].unique()
-    unique_diseases = df['Disease'].unique()
+    # Lags come from the Medicines database when it has rows, like the medicine list
+    feature_store = get_feature_store(dataset_path, conn)
+
+    # Medicine/disease pairs come from the live summary table when the
+    # Medicines database has data, otherwise from the historical CSV.
+    medicine_diseases = summary_medicine_diseases(conn) if conn is not None else {}
+    if not medicine_diseases:
+        medicine_diseases = df.groupby('Medicine', sort=False)['Disease'].unique().to_dict()
+    unique_medicines = list(medicine_diseases)
     
     feature_columns = load_feature_columns(feature_columns_path)
     if feature_columns is None:
@@ -76,6 +215,12 @@ def show_predict_page(model_path='Model/best_rf_model.pkl', feature_columns_path
     model = load_model(model_path)
     if model is None:
         return
+    st.caption(f"Model version: {registry.version(model_path)}")
+    metadata = artifact_metadata(model_path)
+    if metadata:
+        st.caption(f"Trained {metadata['trained_at']} on {metadata['training_rows']} monthly rows "
+                   f"({metadata['data_range'][0]} to {metadata['data_range'][1]}), "
+                   f"test RMSE {metadata['metrics']['rmse']:.2f}")
     
     col1, col2 = st.columns(2)
     
@@ -90,29 +235,58 @@ def show_predict_page(model_path='Model/best_rf_model.pkl', feature_columns_path
     
     Season = st.radio('Season', ('Wet', 'Dry'))
     Medicines = st.multiselect("Select Medicines", unique_medicines)
+    recursive = st.checkbox("Carry each month's forecast into the next month", value=False,
+                            help="Feed every predicted month back in as the next month's previous quantity. "
+                                 "Otherwise all months use the latest recorded quantity.")
 
     if st.button("Submit"):
         if not Medicines:
             st.warning("Please select at least one medicine before submitting.")
             return
 
+        # The table reads the selected month's column and the chart reads the rest.
+        # Disease is not a model feature, so each disease shares its medicine's row.
+        future_months = np.arange(1, 13)
+        model_version, data_version = registry.version(model_path), dataset_version(dataset_path)
+        started = time.perf_counter()
+        if recursive:
+            # Start after the last recorded month, or in January if the year
+            # is already covered by the history, and run to December.
+            reference = feature_store.reference_month() or (Year, 1)
+            start = min((Year, 1), reference)
+            horizon = (Year - start[0]) * 12 + 12 - (start[1] - 1)
+            if horizon > MAX_RECURSIVE_MONTHS:
+                st.error(f"Recursive forecasts reach at most {MAX_RECURSIVE_MONTHS} months past "
+                         f"{start[0]}-{start[1]:02d}. Choose an earlier year or untick the box.")
+                return
+            steps = []
+
+            def predict(X):
+                steps.append(X)
+                return prediction_cache.predict(model, X, model_version, data_version)
+
+            predictions = forecast_recursive(predict, *start, horizon, Medicines, Season,
+                                             feature_columns, feature_store)[:, -12:]
+            input_data = np.stack(steps[-12:], axis=1)
+            st.caption(f"Recursive forecast from {start[0]}-{start[1]:02d}, {horizon} months.")
+        else:
+            # One predict call covers every medicine for all 12 months
+            input_data = preprocess_batch(Year, future_months, Medicines, Season, feature_columns, df, feature_store)
+            predictions = prediction_cache.predict(model, input_data, model_version, data_version)
+            predictions = predictions.reshape(len(Medicines), len(future_months))
+            input_data = input_data.reshape(len(Medicines), len(future_months), -1)
+        log_predictions(Year, Medicines, Season, "recursive" if recursive else "static", feature_columns,
+                        input_data, predictions, model_version, (time.perf_counter() - started) * 1000)
+        predictions = np.rint(predictions).astype(int)
+
         table_data = []
-        for medicine in Medicines:
-            diseases = df[df['Medicine'] == medicine]['Disease'].unique()
-            
-            for disease in diseases:
-                input_data = preprocess_input(Year, Month, [medicine], Season, feature_columns, df)
-                
-                if input_data is None:
-                    return
-
-                # Predict quantity for this medicine-disease combination
-                predictions = model.predict(input_data)
+        for i, medicine in enumerate(Medicines):
+            for disease in medicine_diseases[medicine]:
                 table_data.append({
                     "Month": Month,
                     "Medicine": medicine,
                     "Disease": disease,
-                    "Predicted Quantity": int(round(predictions[0]))
+                    "Predicted Quantity": int(predictions[i, MONTH_MAP[Month] - 1])
                 })
     
         df_result = pd.DataFrame(table_data)
@@ -134,40 +308,21 @@ def show_predict_page(model_path='Model/best_rf_model.pkl', feature_columns_path
         
         
         # Prepare data for future months
-        future_months = np.arange(1, 13)
         predicted_data = pd.DataFrame({'Month': future_months})
 
-        for medicine in Medicines:
-            for disease in df[df['Medicine'] == medicine]['Disease'].unique():
-                predicted_values = []
-                for month in future_months:
-                    month_name = {1: 'January', 2: 'February', 3: 'March', 4: 'April', 5: 'May', 6: 'June',
-                                  7: 'July', 8: 'August', 9: 'September', 10: 'October', 11: 'November',
-                                  12: 'December'}[month]
-                    input_data = preprocess_input(Year, month_name, [medicine], Season, feature_columns, df)
-                    
-                    if input_data is None:
-                        return
-                    
-                    preds = model.predict(input_data)
-                    predicted_values.append(int(round(preds[0])))
-                
-                predicted_data[f'{medicine}_{disease}'] = predicted_values
+        for i, medicine in enumerate(Medicines):
+            for disease in medicine_diseases[medicine]:
+                predicted_data[f'{medicine}_{disease}'] = predictions[i]
         
         predicted_data_long = predicted_data.melt(id_vars=['Month'], var_name='Medicine_Disease', value_name='Predicted Quantity')
         
         st.subheader('Predicted Trend for Selected Medicines in Future Months')
-        line_chart = alt.Chart(predicted_data_long).mark_line().encode(
-            x='Month:Q',
-            y='Predicted Quantity:Q',
-            color='Medicine_Disease:N',
-            tooltip=['Month', 'Medicine_Disease', 'Predicted Quantity']
-        ).properties(
-            width=800,
-            height=400
-        ).configure(background='#045F5F').interactive()
-        
-        st.altair_chart(line_chart)
+        spec = trend_spec()
+        trend_data, total = limit_series(predicted_data_long, ['Medicine_Disease'], 'Predicted Quantity')
+        if total > CHART_MAX_SERIES:
+            st.caption(f"Showing the {CHART_MAX_SERIES} largest of {total} forecast series.")
+        trend_data = fit_budget(spec, compact(trend_data, trend_data.columns), 'Month', ['Medicine_Disease'])
+        st.vega_lite_chart(trend_data, spec)
 
 if __name__ == '__main__':
     show_predict_page()
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from perf_metrics import perf
+
+MAX_ENTRIES = 50_000
+TTL_SECONDS = 6 * 60 * 60
+
+
+class PredictionCache:
+    """Size-bounded LRU cache of model outputs, one row per entry.
+
+    Entries are keyed by the model artifact version and the dataset version
+    together with the feature row, so several models (e.g. the champion and
+    the default forest) share the cache without evicting each other. Entries
+    of a superseded version are never hit again and age out through the LRU
+    bound or after ``ttl_seconds``.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # (model_version, data_version, row) -> (expires_at, prediction)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def predict(self, model, input_data, model_version, data_version=None):
+        """Return ``model.predict(input_data)``, scoring only uncached rows.
+
+        All cache misses are scored together in one ``predict`` call.
+        """
+        input_data = np.asarray(input_data, dtype=float)
+        keys = [(model_version, data_version, row.tobytes()) for row in input_data]
+        predictions = np.empty(len(keys))
+        missing = []
+
+        now = time.monotonic()
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    predictions[i] = entry[1]
+                else:
+                    missing.append(i)
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        perf.increment("prediction_cache.hit", len(keys) - len(missing))
+        perf.increment("prediction_cache.miss", len(missing))
+
+        if missing:
+            with perf.timer("model.predict"):
+                values = model.predict(input_data[missing])
+            predictions[missing] = values
+            expires_at = time.monotonic() + self.ttl_seconds
+            with self._lock:
+                for i, value in zip(missing, values):
+                    self._entries[keys[i]] = (expires_at, value)
+                    self._entries.move_to_end(keys[i])
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        return predictions
+
+    def stats(self):
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+prediction_cache = PredictionCache()
@@ -1,22 +1,11 @@
 import requests
 
 url = 'http://127.0.0.1:5000/predict'
-data = {
-    'Year': 2024,
-    'Month': 1,
-    'Fever': False,
-    'Malaria': True,
-    'Pain': False,
-    'Dry Season': False,
-    'Wet Season': True,
-    'Back Pain': False,
-    'Common Cold': False,
-    'Falciparum': True,
-    'Headache': False,
-    'Influenza': False,
-    'Migraine': False,
-    'Vivax': False
-}
+data = [
+    {'Year': 2024, 'Month': 1, 'Season': 'Wet', 'Medicine': 'Paracetamol'},
+    {'Year': 2024, 'Month': 'February', 'Season': 'Dry', 'Medicine': 'Hydroxychloroquine'},
+    {'Year': 2024, 'Month': 3, 'Season': 'Wet', 'Prev_Month_Quantity': 12},
+]
 
 response = requests.post(url, json=data)
 print(response.json())
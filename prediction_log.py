@@ -0,0 +1,185 @@
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from perf_metrics import perf
+
+PREDICTIONS_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS predictions (
+                           id INTEGER PRIMARY KEY AUTOINCREMENT,
+                           created_at TEXT NOT NULL,
+                           request_id TEXT NOT NULL,
+                           username TEXT,
+                           medicine TEXT NOT NULL,
+                           year INTEGER NOT NULL,
+                           month INTEGER NOT NULL,
+                           season TEXT,
+                           mode TEXT,
+                           inputs TEXT NOT NULL,
+                           model_version TEXT NOT NULL,
+                           prediction REAL NOT NULL,
+                           latency_ms REAL
+                           )'''
+PREDICTION_COLUMNS = ("created_at", "request_id", "username", "medicine", "year", "month", "season",
+                      "mode", "inputs", "model_version", "prediction", "latency_ms")
+_INPUTS = PREDICTION_COLUMNS.index("inputs")
+_INSERT_SQL = (f'INSERT INTO predictions ({", ".join(PREDICTION_COLUMNS)}) '
+               f'VALUES ({", ".join("?" * len(PREDICTION_COLUMNS))})')
+
+BATCH_ROWS = 1000
+FLUSH_INTERVAL_SECONDS = 1.0
+MAX_QUEUED_REQUESTS = 10_000
+
+logger = logging.getLogger(__name__)
+
+
+def create_predictions_table(conn):
+    conn.execute(PREDICTIONS_TABLE_SQL)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_predictions_created_at ON predictions (created_at)')
+
+
+class PredictionLog:
+    """Audit log of served predictions, written to SQLite off the request path.
+
+    ``log`` only appends to an in-memory queue. A daemon writer thread
+    drains it, waiting up to ``flush_interval`` for more rows after the
+    first one, and inserts each batch in a single transaction, so the
+    database writer lock is taken once per batch rather than per request.
+    When the queue is full, new requests are dropped and counted rather
+    than blocking the page.
+    """
+
+    def __init__(self, batch_rows=BATCH_ROWS, flush_interval=FLUSH_INTERVAL_SECONDS,
+                 max_queued=MAX_QUEUED_REQUESTS):
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.db_path = None
+        self._queue = queue.Queue(max_queued)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.logged = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+        self.restarts = 0
+
+    def open(self, db_path):
+        """Start the writer thread for ``db_path``; a no-op if it is already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.db_path = str(db_path)
+            self._start()
+        atexit.register(self.close)
+
+    def _start(self):
+        # Called with self._lock held
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+
+    def log(self, rows):
+        """Queue the rows of one request: tuples in ``PREDICTION_COLUMNS``
+        order, with ``inputs`` as a JSON-serializable dict."""
+        if self._thread is None:
+            return
+        if not self._thread.is_alive():
+            with self._lock:
+                if self._thread is not None and not self._thread.is_alive():
+                    logger.error("Prediction log writer for %s stopped; restarting it", self.db_path)
+                    self.restarts += 1
+                    self._start()
+        try:
+            self._queue.put_nowait(rows)
+        except queue.Full:
+            with self._lock:
+                self.dropped += len(rows)
+            perf.increment("prediction_log.dropped", len(rows))
+            return
+        with self._lock:
+            self.logged += len(rows)
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far is committed."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        """Flush the queue and stop the writer thread."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _next_batch(self):
+        """Block for the next item, then collect more until the batch is full,
+        ``flush_interval`` has passed, or a flush/stop marker arrives.
+
+        Returns ``(rows, marker)``.
+        """
+        rows = []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while isinstance(item, list):
+            rows.extend(item)
+            if len(rows) >= self.batch_rows:
+                return rows, False
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return rows, False
+        return rows, item
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            while True:
+                rows, marker = self._next_batch()
+                if rows:
+                    self._write(conn, rows)
+                if marker is None:
+                    return
+                if marker:
+                    marker.set()
+        finally:
+            conn.close()
+
+    def _write(self, conn, rows):
+        try:
+            with perf.timer("sqlite.prediction_log_write"):
+                # Inputs are serialized here rather than on the request path;
+                # NumPy scalars are written as floats
+                rows = [row[:_INPUTS] + (json.dumps(row[_INPUTS], default=float),) + row[_INPUTS + 1:]
+                        for row in rows]
+                with conn:
+                    conn.executemany(_INSERT_SQL, rows)
+            with self._lock:
+                self.written += len(rows)
+                self.batches += 1
+        except Exception:
+            # Any failure only loses this batch; the writer thread keeps running
+            with self._lock:
+                self.errors += len(rows)
+            logger.exception("Could not write %d predictions to %s", len(rows), self.db_path)
+
+    def stats(self):
+        return {
+            "database": self.db_path,
+            "logged": self.logged,
+            "written": self.written,
+            "batches": self.batches,
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "restarts": self.restarts,
+        }
+
+
+prediction_log = PredictionLog()
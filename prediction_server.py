@@ -0,0 +1,303 @@
+"""Local HTTP prediction service used by ``prediction_input.py``.
+
+Run it with ``python prediction_server.py`` and POST JSON to ``/predict``.
+A payload is one record, a list of records or ``{"instances": [...]}``,
+where each record looks like::
+
+    {"Year": 2025, "Month": "March", "Season": "Wet", "Medicine": "Paracetamol"}
+
+``Month`` may be a name or a number. ``Prev_Month_Quantity`` may be given
+directly instead of ``Medicine``; it and the other lag and rolling-window
+columns of ``feature_store.FEATURE_NAMES`` are otherwise looked up for the
+record's ``Medicine`` (and ``Disease``, if given). Concurrent requests are micro-batched
+into single ``model.predict`` calls. ``GET /metrics`` reports latency and
+throughput, and ``GET /health`` reports the loaded model version.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from http import HTTPStatus
+
+import numpy as np
+
+from batch_forecast import DEFAULT_FEATURE_COLUMNS_PATH, DEFAULT_MODEL_PATH
+from config import HISTORICAL_DATA_PATH
+from data_loader import load_historical_data
+from feature_store import FEATURE_NAMES, FeatureStore
+from model_registry import compiled_or_original, registry
+from predict_page import MONTH_MAP
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def parse_request_head(request_line, headers):
+    """Return ``(method, path, content_length)`` of a request.
+
+    A body needs a ``Content-Length``; without a valid one the request
+    cannot be framed, so it is rejected.
+    """
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise BadRequest("malformed request line")
+    method, path, _ = parts
+    length = headers.get("content-length")
+    if length is None:
+        if method == "POST":
+            raise BadRequest("Content-Length is required")
+        return method, path, 0
+    if not length.isdigit():
+        raise BadRequest(f"invalid Content-Length: {length!r}")
+    return method, path, int(length)
+
+
+def build_feature_row(record, feature_columns, feature_store):
+    """Turn one JSON record into a feature row in ``feature_columns`` order."""
+    if not isinstance(record, dict):
+        raise BadRequest("each record must be a JSON object")
+    row = []
+    for column in feature_columns:
+        if column in record:
+            value = record[column]
+        elif column == 'Prev_Month_Quantity' and 'Medicine' in record:
+            value = feature_store.lag(record['Medicine'])
+        elif column in FEATURE_NAMES and 'Medicine' in record:
+            value = feature_store.features(record['Medicine'], record.get('Disease'))[column]
+        elif column.startswith('Season_') and 'Season' in record:
+            value = 1 if record['Season'] == column[len('Season_'):] else 0
+        else:
+            raise BadRequest(f"missing feature '{column}'")
+        if column == 'Month' and isinstance(value, str):
+            value = MONTH_MAP.get(value, 0)
+        try:
+            row.append(float(value))
+        except (TypeError, ValueError):
+            raise BadRequest(f"feature '{column}' must be numeric") from None
+    return row
+
+
+class Metrics:
+    """Request counters and a window of recent latencies."""
+
+    def __init__(self, window=10_000):
+        self.started_at = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.rows = 0
+        self.batches = 0
+        self.batched_rows = 0
+        self._latencies = deque(maxlen=window)
+
+    def observe(self, latency, rows):
+        self.requests += 1
+        self.rows += rows
+        self._latencies.append(latency)
+
+    def snapshot(self):
+        uptime = time.monotonic() - self.started_at
+        latencies = np.array(self._latencies) * 1000
+        percentiles = (
+            dict(zip(("p50_ms", "p95_ms", "p99_ms"), np.percentile(latencies, [50, 95, 99]).round(3).tolist()))
+            if len(latencies) else {}
+        )
+        return {
+            "uptime_s": round(uptime, 3),
+            "requests": self.requests,
+            "errors": self.errors,
+            "rows": self.rows,
+            "batches": self.batches,
+            "mean_batch_rows": round(self.batched_rows / self.batches, 3) if self.batches else 0,
+            "requests_per_s": round(self.requests / uptime, 3) if uptime else 0,
+            "rows_per_s": round(self.rows / uptime, 3) if uptime else 0,
+            "latency": percentiles,
+        }
+
+
+class MicroBatcher:
+    """Coalesces concurrent prediction requests into single predict calls.
+
+    A batch is flushed once it holds ``max_batch_rows`` rows or
+    ``max_wait_ms`` after its first request arrived, whichever is first.
+    """
+
+    def __init__(self, model_path, metrics, max_batch_rows=4096, max_wait_ms=5):
+        self.model_path = model_path
+        self.metrics = metrics
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self._queue = asyncio.Queue()
+
+    async def predict(self, rows):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((rows, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            n_rows = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while n_rows < self.max_batch_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                n_rows += len(item[0])
+
+            try:
+                model, model_version = registry.get(self.model_path)
+                input_data = np.array([row for rows, _ in batch for row in rows], dtype=float)
+                predictions = await loop.run_in_executor(None, model.predict, input_data)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.metrics.batches += 1
+            self.metrics.batched_rows += n_rows
+            offset = 0
+            for rows, future in batch:
+                if not future.done():
+                    future.set_result((predictions[offset:offset + len(rows)].tolist(), model_version))
+                offset += len(rows)
+
+
+class PredictionServer:
+    def __init__(self, model_path, feature_columns_path, feature_store, **batcher_options):
+        self.model_path = model_path
+        self.feature_columns_path = feature_columns_path
+        self.feature_store = feature_store
+        self.metrics = Metrics()
+        self.batcher = MicroBatcher(model_path, self.metrics, **batcher_options)
+
+    async def handle_predict(self, body):
+        try:
+            payload = json.loads(body or b"null")
+        except json.JSONDecodeError as e:
+            raise BadRequest(f"invalid JSON: {e}") from None
+        if isinstance(payload, dict) and "instances" in payload:
+            payload = payload["instances"]
+        records = payload if isinstance(payload, list) else [payload]
+        if not records:
+            raise BadRequest("no records to predict")
+
+        feature_columns, _ = registry.get(self.feature_columns_path)
+        rows = [build_feature_row(record, feature_columns, self.feature_store) for record in records]
+        predictions, model_version = await self.batcher.predict(rows)
+        return {"predictions": predictions, "model_version": model_version}
+
+    async def route(self, method, path, body):
+        if method == "POST" and path == "/predict":
+            return HTTPStatus.OK, await self.handle_predict(body)
+        if method == "GET" and path == "/metrics":
+            return HTTPStatus.OK, self.metrics.snapshot()
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, {"status": "ok", "model_version": registry.version(self.model_path)}
+        return HTTPStatus.NOT_FOUND, {"error": f"no route for {method} {path}"}
+
+    async def handle_request(self, reader, request_line, headers):
+        """Read the body of one request and return ``(status, response, keep_alive)``."""
+        try:
+            method, path, length = parse_request_head(request_line, headers)
+        except BadRequest as e:
+            # The next request cannot be located, so answer and close
+            self.metrics.errors += 1
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}, False
+        if length > MAX_BODY_BYTES:
+            return HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "payload too large"}, False
+
+        body = await reader.readexactly(length) if length else b""
+        keep_alive = headers.get("connection", "").lower() != "close"
+        start = time.perf_counter()
+        try:
+            status, response = await self.route(method, path.split("?", 1)[0], body)
+        except BadRequest as e:
+            status, response = HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except Exception as e:
+            status, response = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+        if path.startswith("/predict"):
+            if status == HTTPStatus.OK:
+                self.metrics.observe(time.perf_counter() - start, len(response["predictions"]))
+            else:
+                self.metrics.errors += 1
+        return status, response, keep_alive
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                status, response, keep_alive = await self.handle_request(reader, request_line, headers)
+                data = json.dumps(response).encode()
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        registry.get(self.model_path)
+        registry.get(self.feature_columns_path)
+        batcher_task = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving predictions on http://{host}:{port}/predict "
+              f"(model {registry.version(self.model_path)})")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve medicine quantity predictions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--model", default=str(DEFAULT_MODEL_PATH))
+    parser.add_argument("--feature-columns", default=str(DEFAULT_FEATURE_COLUMNS_PATH))
+    parser.add_argument("--dataset", default=str(HISTORICAL_DATA_PATH))
+    parser.add_argument("--max-batch-rows", type=int, default=4096)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    args = parse_args(argv)
+    feature_store = FeatureStore.from_dataframe(load_historical_data(args.dataset))
+    server = PredictionServer(compiled_or_original(args.model), args.feature_columns, feature_store,
+                              max_batch_rows=args.max_batch_rows, max_wait_ms=args.max_wait_ms)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
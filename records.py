@@ -1,5 +1,11 @@
 import streamlit as st
 import pandas as pd
+import os
+import sqlite3
+import tempfile
+
+from medicine_db import medicines_version
+from perf_metrics import perf
 
 # Function to handle actions
 def handle_action(action, row_id, conn):
@@ -15,29 +21,171 @@ def handle_action(action, row_id, conn):
         st.session_state['page'] = 'Records'
         st.rerun()  # Rerun the app to refresh the records page'''
 
+FILTER_COLUMNS = ("Medicine", "Disease", "Season")
+
+def build_filters(medicines=(), diseases=(), seasons=(), start_date=None, end_date=None):
+    """Return a SQL WHERE clause and its parameters for the Records filters."""
+    clauses, params = [], []
+    for column, values in zip(FILTER_COLUMNS, (medicines, diseases, seasons)):
+        if values:
+            clauses.append(f'"{column}" IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+    if start_date:
+        clauses.append('"Date" >= ?')
+        params.append(start_date.isoformat())
+    if end_date:
+        clauses.append('"Date" <= ?')
+        params.append(end_date.isoformat())
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+@st.cache_data(show_spinner=False, max_entries=32)
+@perf.timed("sqlite.distinct_values")
+def _distinct_values(database, version, column, _conn):
+    cursor = _conn.cursor()
+    cursor.execute(f'SELECT DISTINCT "{column}" FROM Medicines WHERE "{column}" IS NOT NULL ORDER BY 1')
+    return [row[0] for row in cursor.fetchall()]
+
+def distinct_values(conn, column):
+    """Return the distinct values of a Medicines column, cached until Medicines changes."""
+    return _distinct_values(database_path(conn), medicines_version(conn), column, conn)
+
+@perf.timed("sqlite.count_records")
+def count_records(conn, where="", params=()):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM Medicines {where}", params)
+    return cursor.fetchone()[0]
+
+@perf.timed("sqlite.fetch_page")
+def fetch_page(conn, where="", params=(), limit=10, offset=0):
+    """Fetch one page of records; only ``limit`` rows leave SQLite."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT rowid, * FROM Medicines {where} ORDER BY rowid LIMIT ? OFFSET ?",
+                   (*params, limit, offset))
+    columns = ["ID"] + [description[0] for description in cursor.description[1:]]
+    return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+def records_filters(conn):
+    """Render the Records filter widgets and return the matching WHERE clause."""
+    with st.expander("Filters"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            medicines = st.multiselect("Medicine", distinct_values(conn, "Medicine"))
+        with col2:
+            diseases = st.multiselect("Disease", distinct_values(conn, "Disease"))
+        with col3:
+            seasons = st.multiselect("Season", distinct_values(conn, "Season"))
+        date_range = st.date_input("Date range", value=())
+    start_date = date_range[0] if len(date_range) > 0 else None
+    end_date = date_range[1] if len(date_range) > 1 else None
+    return build_filters(medicines, diseases, seasons, start_date, end_date)
+
+EXPORT_CHUNK_SIZE = 10_000
+EXPORT_FORMATS = {"CSV": ("csv", "text/csv"), "Parquet": ("parquet", "application/octet-stream")}
+
+def database_path(conn):
+    """Return the file path of the main database behind a connection."""
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+def iter_record_chunks(db_path, where="", params=(), chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield matching records as DataFrames of at most ``chunk_size`` rows.
+
+    Uses its own connection and one short keyset query per chunk
+    (``rowid > last seen``), so no read lock is held between chunks and
+    writers from other sessions are not blocked for the whole export.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        keyset = f"{where} AND rowid > ?" if where else "WHERE rowid > ?"
+        last_id = 0
+        while True:
+            cursor = conn.execute(f"SELECT rowid, * FROM Medicines {keyset} ORDER BY rowid LIMIT ?",
+                                  (*params, last_id, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            columns = ["ID"] + [description[0] for description in cursor.description[1:]]
+            yield pd.DataFrame(rows, columns=columns)
+            last_id = rows[-1][0]
+    finally:
+        conn.close()
+
+@perf.timed("records.export")
+def export_records(db_path, out_path, fmt="CSV", where="", params=(), chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream matching records into a CSV or Parquet file and return the row count."""
+    total = 0
+    if fmt == "Parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in iter_record_chunks(db_path, where, params, chunk_size):
+                chunk = chunk.astype({column: "string" for column in chunk.columns
+                                      if chunk[column].dtype == object})
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    schema = table.schema
+                    writer = pq.ParquetWriter(out_path, schema)
+                writer.write_table(table.cast(schema))
+                total += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        with open(out_path, "w", newline="") as file:
+            for chunk in iter_record_chunks(db_path, where, params, chunk_size):
+                chunk.to_csv(file, header=(total == 0), index=False)
+                total += len(chunk)
+    return total
+
+def records_export(conn, where, params):
+    """Render the export controls for the filtered records."""
+    with st.expander("Export"):
+        fmt = st.radio("Format", list(EXPORT_FORMATS), horizontal=True)
+        extension, mime = EXPORT_FORMATS[fmt]
+
+        if st.button("Prepare export"):
+            st.session_state.pop("records_export", None)
+            # The download button keeps its own copy of the bytes, so the
+            # file is only needed while the export is written
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, f"medicines.{extension}")
+                with st.spinner("Exporting records..."):
+                    rows = export_records(database_path(conn), path, fmt, where, params)
+                with open(path, "rb") as file:
+                    data = file.read()
+            st.session_state["records_export"] = {"data": data, "format": fmt, "rows": rows}
+
+        export = st.session_state.get("records_export")
+        if export and export["format"] == fmt:
+            st.download_button(f"Download {export['rows']} records", export["data"],
+                               file_name=f"medicines.{extension}", mime=mime)
+
 # Function for the records page
 def records(conn):
     st.title("Records")
 
     if conn:
-        cursor = conn.cursor()
         st.subheader("All Records")
 
-        cursor.execute("SELECT rowid, * FROM Medicines")
-        medicines = cursor.fetchall()
-
-        columns = ["ID"] + [description[0] for description in cursor.description[1:]]
-
-        if medicines:
-            df = pd.DataFrame(medicines, columns=columns)
+        where, params = records_filters(conn)
+        total = count_records(conn, where, params)
+        records_export(conn, where, params)
 
-            max_entries = len(df)
-            entries_to_show = st.number_input('Entries to show', min_value=1, max_value=max_entries, value=min(10, max_entries))
-            df_to_show = df.head(entries_to_show)
+        if total:
+            col1, col2 = st.columns(2)
+            with col1:
+                entries_to_show = st.number_input('Entries to show', min_value=1, max_value=total, value=min(10, total))
+            page_count = -(-total // entries_to_show)
+            with col2:
+                page = st.number_input('Page', min_value=1, max_value=page_count, value=1)
 
+            df_to_show = fetch_page(conn, where, params, entries_to_show, (page - 1) * entries_to_show)
             st.dataframe(df_to_show)
+            st.caption(f"Page {page} of {page_count} ({total} matching records)")
 
-            '''selected_id = st.selectbox("Select an entry", df['ID'], index=0)
+            '''selected_id = st.selectbox("Select an entry", df_to_show['ID'], index=0)
 
             if selected_id:
                 col1, col2 = st.columns([1, 1])
@@ -0,0 +1,220 @@
+"""Seeded synthetic Medicines data for scale and load testing.
+
+Example::
+
+    python synthetic_data.py --rows 10000000 --output synthetic.csv
+    python synthetic_data.py --rows 1000000 --output synthetic.db --seed 7
+
+Distributions are learned from the historical dataset. Patient names
+combine observed first and last names. Medicine/disease/variety
+combinations are drawn with their observed frequencies per season. The
+Wet/Dry season follows each month's observed split, and quantities come
+from each medicine's observed quantities in that season. Rows are produced
+in date order in fixed-size chunks, so memory stays bounded at any row
+count. The same seed and chunk size always produce the same rows.
+"""
+import argparse
+import logging
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import HISTORICAL_DATA_PATH
+from data_loader import DATE_FORMAT, _parse_csv
+from medicine_db import MEDICINES_COLUMNS
+
+DEFAULT_CHUNKSIZE = 100_000
+SEASONS = ("Wet", "Dry")
+COMBO_COLUMNS = ["Medicine", "Disease", "Variety"]
+
+
+def _distribution(counts):
+    """Return ``(values, probabilities)`` for a Series of counts."""
+    return counts.index.to_numpy(), (counts / counts.sum()).to_numpy()
+
+
+class DataProfile:
+    """Distributions of the historical data that synthetic rows are drawn from."""
+
+    def __init__(self, first_names, last_names, season_by_month, combos_by_season,
+                 quantities, start, end):
+        self.first_names = first_names
+        self.last_names = last_names
+        self.season_by_month = season_by_month      # month -> P(Wet), P(Dry)
+        self.combos_by_season = combos_by_season    # season -> (combo rows, probabilities)
+        self.quantities = quantities                # (medicine, season) -> (values, probabilities)
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Learn the profile from a frame with a parsed ``Date`` column."""
+        names = df["Patient Name"].str.strip().str.split(n=1, expand=True)
+        first_names = np.sort(names[0].dropna().unique())
+        last_names = np.sort(names[1].dropna().unique())
+
+        months = df.groupby([df["Date"].dt.month, "Season"]).size().unstack(fill_value=0)
+        months = months.reindex(index=range(1, 13), columns=list(SEASONS), fill_value=0)
+        # Months without any data get an even split
+        months.loc[months.sum(axis=1) == 0] = 1
+        season_by_month = months.div(months.sum(axis=1), axis=0).to_numpy()
+
+        combos_by_season = {}
+        for season in SEASONS:
+            counts = df[df["Season"] == season].groupby(COMBO_COLUMNS).size()
+            if counts.empty:
+                counts = df.groupby(COMBO_COLUMNS).size()
+            combos = counts.index.to_frame(index=False).to_numpy(dtype=object)
+            combos_by_season[season] = (combos, (counts / counts.sum()).to_numpy())
+
+        quantities = {}
+        for (medicine, season), group in df.groupby(["Medicine", "Season"]):
+            quantities[medicine, season] = _distribution(group["Quantity(Packets)"].value_counts().sort_index())
+        for medicine, group in df.groupby("Medicine"):
+            for season in SEASONS:
+                quantities.setdefault((medicine, season),
+                                      _distribution(group["Quantity(Packets)"].value_counts().sort_index()))
+
+        return cls(first_names, last_names, season_by_month, combos_by_season, quantities,
+                   df["Date"].min().normalize(), df["Date"].max().normalize())
+
+    @classmethod
+    def from_csv(cls, path=HISTORICAL_DATA_PATH):
+        return cls.from_dataframe(_parse_csv(path))
+
+
+def generate_chunks(n_rows, seed=0, chunksize=DEFAULT_CHUNKSIZE, start=None, end=None, profile=None):
+    """Yield DataFrames of synthetic Medicines rows in date order.
+
+    Rows are spread evenly over the days from ``start`` to ``end``
+    (default: the historical date range). ``Date`` is a datetime column.
+    """
+    profile = profile or DataProfile.from_csv()
+    start = pd.Timestamp(start) if start is not None else profile.start
+    end = pd.Timestamp(end) if end is not None else profile.end
+    n_days = (end - start).days + 1
+    if n_days <= 0:
+        raise ValueError("end must not be before start")
+    rng = np.random.default_rng(seed)
+
+    for offset in range(0, n_rows, chunksize):
+        size = min(chunksize, n_rows - offset)
+        # Row k falls on day floor(k * n_days / n_rows), so dates increase monotonically
+        days = (np.arange(offset, offset + size, dtype=np.int64) * n_days) // n_rows
+        dates = start + pd.to_timedelta(days, unit="D")
+
+        p_wet = profile.season_by_month[dates.month.to_numpy() - 1, 0]
+        seasons = np.where(rng.random(size) < p_wet, SEASONS[0], SEASONS[1])
+
+        combos = np.empty((size, len(COMBO_COLUMNS)), dtype=object)
+        for season in SEASONS:
+            mask = seasons == season
+            values, probabilities = profile.combos_by_season[season]
+            combos[mask] = values[rng.choice(len(values), size=mask.sum(), p=probabilities)]
+
+        quantity = np.zeros(size, dtype=np.int64)
+        keys = pd.MultiIndex.from_arrays([combos[:, 0], seasons])
+        for key in keys.unique():
+            mask = (combos[:, 0] == key[0]) & (seasons == key[1])
+            values, probabilities = profile.quantities[key]
+            quantity[mask] = rng.choice(values, size=mask.sum(), p=probabilities)
+
+        first = profile.first_names[rng.integers(len(profile.first_names), size=size)]
+        last = profile.last_names[rng.integers(len(profile.last_names), size=size)]
+
+        yield pd.DataFrame({
+            "Patient Name": pd.Series(first, dtype=object) + " " + pd.Series(last, dtype=object),
+            "Medicine": combos[:, 0],
+            "Disease": combos[:, 1],
+            "Variety": combos[:, 2],
+            "Quantity(Packets)": quantity,
+            "Date": dates,
+            "Season": seasons,
+        }, columns=list(MEDICINES_COLUMNS))
+
+
+def synthetic_history(n_rows, seed=0, **options):
+    """Return ``n_rows`` synthetic rows as one frame, formatted like the historical CSV."""
+    df = pd.concat(generate_chunks(n_rows, seed, **options), ignore_index=True)
+    df["Date"] = df["Date"].dt.strftime(DATE_FORMAT)
+    return df
+
+
+def write_csv(path, chunks):
+    """Write chunks in the historical CSV format and return the row count."""
+    total = 0
+    with open(path, "w", newline="") as file:
+        for chunk in chunks:
+            chunk = chunk.assign(Date=chunk["Date"].dt.strftime(DATE_FORMAT))
+            chunk.to_csv(file, header=(total == 0), index=False)
+            total += len(chunk)
+    return total
+
+
+def write_sqlite(conn, chunks):
+    """Insert chunks into the Medicines table, one transaction per chunk."""
+    columns = ", ".join(f'"{column}"' for column in MEDICINES_COLUMNS)
+    sql = f'INSERT INTO Medicines ({columns}) VALUES ({", ".join("?" * len(MEDICINES_COLUMNS))})'
+    total = 0
+    for chunk in chunks:
+        chunk = chunk.assign(Date=chunk["Date"].dt.strftime("%Y-%m-%d"),
+                             **{"Quantity(Packets)": chunk["Quantity(Packets)"].astype(object)})
+        with conn:
+            conn.executemany(sql, chunk.itertuples(index=False, name=None))
+        total += len(chunk)
+    return total
+
+
+def _with_progress(chunks, n_rows):
+    start = time.perf_counter()
+    done = 0
+    for chunk in chunks:
+        yield chunk
+        done += len(chunk)
+        elapsed = time.perf_counter() - start
+        print(f"\r{done:,}/{n_rows:,} rows ({done / elapsed:,.0f} rows/s)",
+              end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic Medicines data for scale testing.")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--output", required=True,
+                        help="CSV file, or a .db/.sqlite file whose Medicines table is filled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", help="first date (YYYY-MM-DD), default: start of the historical data")
+    parser.add_argument("--end", help="last date (YYYY-MM-DD), default: end of the historical data")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--dataset", default=str(HISTORICAL_DATA_PATH), help="CSV to learn distributions from")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    args = parse_args(argv)
+    profile = DataProfile.from_csv(args.dataset)
+    chunks = _with_progress(
+        generate_chunks(args.rows, args.seed, args.chunksize, args.start, args.end, profile), args.rows)
+
+    if Path(args.output).suffix.lower() in (".db", ".sqlite", ".sqlite3"):
+        from migrations import MEDICINES_MIGRATIONS, apply_migrations
+
+        conn = sqlite3.connect(args.output)
+        conn.execute("PRAGMA synchronous = NORMAL")
+        try:
+            apply_migrations(conn, MEDICINES_MIGRATIONS)
+            total = write_sqlite(conn, chunks)
+        finally:
+            conn.close()
+    else:
+        total = write_csv(args.output, chunks)
+    print(f"Wrote {total:,} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Monthly totals, lags and rolling windows of the feature store."""
+import pickle
+import random
+import sqlite3
+
+import pytest
+
+from feature_store import FeatureStore, get_feature_store, record_insert
+from medicine_db import medicines_version
+from migrations import MEDICINES_MIGRATIONS, apply_migrations
+
+
+def _scan_lag(totals, target):
+    earlier = [period for period in totals if period < target]
+    return totals[max(earlier)] if earlier else 0
+
+
+@pytest.fixture
+def store():
+    rng = random.Random(0)
+    store = FeatureStore()
+    months = [(year, month) for year in range(2018, 2025) for month in range(1, 13)]
+    rng.shuffle(months)
+    for year, month in months:
+        if rng.random() < 0.6:
+            store.add("Aspirin", year, month, rng.randint(1, 40), rng.choice(["Fever", "Pain"]))
+    return store
+
+
+def test_lag_before_month_matches_scan(store):
+    totals = store._totals[("Aspirin", None)]
+    for year in range(2017, 2026):
+        for month in range(1, 13):
+            assert store.lag("Aspirin", None, year, month) == _scan_lag(totals, year * 12 + month - 1)
+    assert store.lag("Aspirin") == totals[max(totals)]
+    assert store.lag("Unknown", None, 2020, 1) == 0
+
+
+def test_lag_after_out_of_order_add(store):
+    store.add("Aspirin", 2010, 3, 5)
+    assert store.lag("Aspirin", None, 2010, 4) == 5
+    assert store.lag("Aspirin", None, 2010, 3) == 0
+
+
+def test_pickle_round_trip(store):
+    restored = pickle.loads(pickle.dumps(store))
+    assert restored.features("Aspirin") == store.features("Aspirin")
+    assert restored.lag("Aspirin", "Fever", 2021, 6) == store.lag("Aspirin", "Fever", 2021, 6)
+
+
+INSERT_SQL = ('INSERT INTO Medicines ("Patient Name", "Medicine", "Disease", "Variety", "Quantity(Packets)", '
+              '"Date", "Season") VALUES (?, ?, ?, ?, ?, ?, ?)')
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "medicines.db", check_same_thread=False)
+    apply_migrations(conn, MEDICINES_MIGRATIONS)
+    with conn:
+        conn.executemany(INSERT_SQL, [("P", "Aspirin", "Fever", "Tablet", month, f"2024-{month:02d}-10", "Wet")
+                                      for month in range(1, 7)])
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def rebuilds(monkeypatch):
+    calls = []
+    from_db = FeatureStore.from_db.__func__
+    monkeypatch.setattr(FeatureStore, "from_db", classmethod(lambda cls, conn: calls.append(1) or from_db(cls, conn)))
+    return calls
+
+
+def _insert(conn, quantity, date):
+    conn.execute(INSERT_SQL, ("Q", "Aspirin", "Fever", "Tablet", quantity, date, "Wet"))
+    version = medicines_version(conn)
+    conn.commit()
+    return record_insert(conn, version, "Aspirin", quantity, date, "Fever")
+
+
+def test_insert_updates_store_without_rebuild(conn, rebuilds):
+    store = get_feature_store(conn=conn)
+    assert len(rebuilds) == 1 and store.lag("Aspirin") == 6
+
+    assert _insert(conn, 20, "2024-07-03")
+    assert _insert(conn, 5, "2024-07-21")
+    assert get_feature_store(conn=conn) is store
+    assert len(rebuilds) == 1
+
+    features = store.features("Aspirin")
+    assert store.reference_month() == (2024, 8)
+    assert features["Prev_Month_Quantity"] == features["Lag_1"] == 25
+    assert features["Rolling_Sum_3"] == 5 + 6 + 25
+    assert features == FeatureStore.from_db(conn).features("Aspirin")
+
+
+def test_other_writes_rebuild_store(conn, rebuilds):
+    store = get_feature_store(conn=conn)
+    other = sqlite3.connect(conn.execute("PRAGMA database_list").fetchone()[2])
+    with other:
+        other.execute('UPDATE Medicines SET "Quantity(Packets)" = 100 WHERE "Date" = ?', ("2024-06-10",))
+    other.close()
+
+    # The store missed a change, so the row is left for the rebuild
+    assert not _insert(conn, 20, "2024-07-03")
+    assert get_feature_store(conn=conn) is store
+    assert len(rebuilds) == 2
+    assert store.features("Aspirin")["Lag_2"] == 100
+    assert store.lag("Aspirin") == 20
@@ -0,0 +1,57 @@
+"""Medicines schema: indexes per migration, index usage of the common queries and the ISO date triggers."""
+import sqlite3
+
+import pytest
+
+from medicine_db import MEDICINES_COLUMNS, check_common_queries
+from migrations import MEDICINES_MIGRATIONS, apply_migrations
+
+_COLUMN_LIST = ", ".join(f'"{column}"' for column in MEDICINES_COLUMNS)
+INSERT_SQL = f'INSERT INTO Medicines ({_COLUMN_LIST}) VALUES ({", ".join("?" * len(MEDICINES_COLUMNS))})'
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "medicines.db")
+    apply_migrations(conn, MEDICINES_MIGRATIONS)
+    yield conn
+    conn.close()
+
+
+def _indexes(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")}
+
+
+def test_dedupe_index_comes_from_its_own_migration(tmp_path):
+    conn = sqlite3.connect(tmp_path / "medicines.db")
+    apply_migrations(conn, MEDICINES_MIGRATIONS[:2])
+    assert "idx_medicines_import_dedupe" not in _indexes(conn)
+    apply_migrations(conn, MEDICINES_MIGRATIONS)
+    assert "idx_medicines_import_dedupe" in _indexes(conn)
+    conn.close()
+
+
+def _row(date):
+    return ("Patient", "Paracetamol", "Pain", "Tablet", 3, date, "Wet")
+
+
+def test_common_queries_use_indexes(conn):
+    with conn:
+        conn.executemany(INSERT_SQL, [_row(f"2021-{month:02d}-15") for month in range(1, 13)])
+    assert check_common_queries(conn) == {}
+
+
+def test_iso_date_trigger_rejects_other_formats(conn):
+    with pytest.raises(sqlite3.IntegrityError, match="YYYY-MM-DD"):
+        with conn:
+            conn.execute(INSERT_SQL, _row("01/15/2024"))
+    assert conn.execute("SELECT COUNT(*) FROM Medicines").fetchone()[0] == 0
+
+
+def test_iso_date_trigger_checks_updates(conn):
+    with conn:
+        conn.execute(INSERT_SQL, _row("2024-01-15"))
+    with pytest.raises(sqlite3.IntegrityError, match="YYYY-MM-DD"):
+        with conn:
+            conn.execute('UPDATE Medicines SET "Date" = ?', ("01/15/2024",))
+    assert conn.execute('SELECT "Date" FROM Medicines').fetchone()[0] == "2024-01-15"
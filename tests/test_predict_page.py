@@ -0,0 +1,73 @@
+"""Which artifacts the Predict page loads, and its recursive forecast option."""
+from pathlib import Path
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def _page(model_path, feature_columns_path):
+    import streamlit as st
+
+    import predict_page
+
+    loaded = []
+    load_feature_columns = predict_page.load_feature_columns
+    predict_page.load_feature_columns = lambda path: loaded.append(str(path)) or load_feature_columns(path)
+    try:
+        predict_page.show_predict_page(model_path=model_path, feature_columns_path=feature_columns_path)
+    finally:
+        predict_page.load_feature_columns = load_feature_columns
+    st.text(f"feature columns: {','.join(loaded)}")
+
+
+def _run(model_path=None, feature_columns_path=None):
+    at = AppTest.from_function(_page, args=(model_path, feature_columns_path), default_timeout=120).run()
+    assert not at.exception
+    assert not at.error
+    return at.text[-1].value
+
+
+@pytest.fixture(autouse=True)
+def project_dir(monkeypatch):
+    monkeypatch.chdir(PROJECT_DIR)
+
+
+def test_explicit_model_uses_default_feature_columns():
+    assert _run(model_path="Model/best_rf_model.pkl") == "feature columns: Model/feature_columns.pkl"
+
+
+def test_explicit_feature_columns_are_kept():
+    assert _run(feature_columns_path="Model/feature_columns.pkl") == "feature columns: Model/feature_columns.pkl"
+
+
+def _forecast():
+    import predict_page
+
+    predict_page.show_predict_page(model_path="Model/best_rf_model.pkl")
+
+
+def _submit(year, carry=None):
+    at = AppTest.from_function(_forecast, default_timeout=120).run()
+    at.number_input[0].set_value(year)
+    at.multiselect[0].set_value(["Paracetamol"])
+    if carry is not None:
+        at.checkbox[0].set_value(carry)
+    at.button[0].click().run()
+    assert not at.exception
+    return at
+
+
+def test_recursive_forecast_is_opt_in():
+    at = _submit(2025)
+    assert not at.checkbox[0].value
+    assert not any("Recursive forecast" in caption.value for caption in at.caption)
+    at = _submit(2025, carry=True)
+    assert any("Recursive forecast" in caption.value for caption in at.caption)
+
+
+def test_recursive_horizon_is_capped():
+    at = _submit(2100, carry=True)
+    assert "at most" in at.error[0].value
+    assert not at.table
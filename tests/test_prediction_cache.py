@@ -0,0 +1,46 @@
+"""Hits, misses and per-model entries of the prediction cache."""
+import numpy as np
+
+from prediction_cache import PredictionCache
+
+
+class CountingModel:
+    def __init__(self, offset):
+        self.offset = offset
+        self.rows = 0
+
+    def predict(self, X):
+        self.rows += len(X)
+        return X.sum(axis=1) + self.offset
+
+
+X = np.arange(12, dtype=float).reshape(4, 3)
+
+
+def test_scores_only_missing_rows():
+    cache, model = PredictionCache(), CountingModel(0)
+    np.testing.assert_array_equal(cache.predict(model, X[:2], "v1"), X[:2].sum(axis=1))
+    np.testing.assert_array_equal(cache.predict(model, X, "v1"), X.sum(axis=1))
+    assert model.rows == 4
+    assert cache.stats()["hits"] == 2
+
+
+def test_models_do_not_evict_each_other():
+    cache, champion, forest = PredictionCache(), CountingModel(0), CountingModel(100)
+    for _ in range(3):
+        np.testing.assert_array_equal(cache.predict(champion, X, "champion", 1), X.sum(axis=1))
+        np.testing.assert_array_equal(cache.predict(forest, X, "forest", 1), X.sum(axis=1) + 100)
+    assert champion.rows == forest.rows == 4
+
+
+def test_new_data_version_is_scored_again():
+    cache, model = PredictionCache(), CountingModel(0)
+    cache.predict(model, X, "v1", 1)
+    cache.predict(model, X, "v1", 2)
+    assert model.rows == 8
+
+
+def test_lru_bound():
+    cache, model = PredictionCache(max_entries=3), CountingModel(0)
+    cache.predict(model, X, "v1")
+    assert cache.stats()["size"] == 3 and cache.stats()["evictions"] == 1
@@ -0,0 +1,54 @@
+"""Request framing and error responses of the prediction server."""
+import asyncio
+import json
+
+import pytest
+
+from feature_store import FeatureStore
+from prediction_server import PredictionServer
+
+
+class _Writer:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+async def _exchange(request):
+    # None of these requests reach the model
+    server = PredictionServer("model.pkl", "feature_columns.pkl", FeatureStore())
+    reader = asyncio.StreamReader()
+    reader.feed_data(request)
+    reader.feed_eof()
+    writer = _Writer()
+    await server.handle_connection(reader, writer)
+    head, _, body = b"".join(writer.chunks).partition(b"\r\n\r\n")
+    return head.split(b"\r\n"), json.loads(body) if body else None, server.metrics.snapshot()["errors"]
+
+
+@pytest.mark.parametrize("request_bytes, error", [
+    (b"garbage\r\n\r\n", "malformed request line"),
+    (b"POST /predict HTTP/1.1\r\n\r\n{}", "Content-Length is required"),
+    (b"POST /predict HTTP/1.1\r\nContent-Length: ten\r\n\r\n{}", "invalid Content-Length: 'ten'"),
+    (b"POST /predict HTTP/1.1\r\nContent-Length: -1\r\n\r\n", "invalid Content-Length: '-1'"),
+], ids=["request-line", "missing-length", "non-integer-length", "negative-length"])
+def test_unframeable_requests_get_400(request_bytes, error):
+    head, response, errors = asyncio.run(_exchange(request_bytes))
+    assert head[0] == b"HTTP/1.1 400 Bad Request"
+    assert b"Connection: close" in head
+    assert response == {"error": error}
+    assert errors == 1
+
+
+def test_get_without_length_is_served():
+    head, response, errors = asyncio.run(_exchange(b"GET /nowhere HTTP/1.1\r\nConnection: close\r\n\r\n"))
+    assert head[0] == b"HTTP/1.1 404 Not Found"
+    assert errors == 0
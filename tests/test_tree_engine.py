@@ -0,0 +1,87 @@
+"""Parity of tree_engine's compiled models with sklearn's predictions."""
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeRegressor
+
+from tree_engine import CompiledForest, compile_model, parity_inputs
+
+MODEL_PATH = Path(__file__).resolve().parent.parent / "Model" / "best_rf_model.pkl"
+RTOL = ATOL = 1e-9
+
+
+def _training_data(n_rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(2018, 2025, n_rows),
+        rng.integers(1, 13, n_rows),
+        rng.uniform(0, 60, n_rows),
+        rng.integers(0, 2, n_rows),
+    ]).astype(float)
+    y = 5 + 0.4 * X[:, 2] + 3 * np.sin(X[:, 1]) + 2 * X[:, 3] + rng.normal(0, 1, n_rows)
+    return X, y
+
+
+def _sklearn_predict(model, X):
+    # Models fitted on DataFrames warn about unnamed inputs
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        return model.predict(X)
+
+
+def assert_parity(model, compiled, n_rows=5_000):
+    X = parity_inputs(compiled, n_rows)
+    np.testing.assert_allclose(compiled.predict(X), _sklearn_predict(model, X), rtol=RTOL, atol=ATOL)
+
+
+@pytest.fixture(scope="module")
+def app_model():
+    if not MODEL_PATH.exists():
+        pytest.skip(f"{MODEL_PATH} is not available")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return joblib.load(MODEL_PATH)
+
+
+@pytest.mark.parametrize("max_table_cells", [0, None], ids=["traverse", "table"])
+def test_app_random_forest(app_model, max_table_cells):
+    options = {} if max_table_cells is None else {"max_table_cells": max_table_cells}
+    compiled = compile_model(app_model, **options)
+    # The app's four-feature forest is small enough to tabulate
+    assert (compiled.table is not None) == (max_table_cells is None)
+    assert_parity(app_model, compiled)
+
+
+@pytest.mark.parametrize("model", [
+    RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0),
+    ExtraTreesRegressor(n_estimators=20, max_depth=8, random_state=0),
+    GradientBoostingRegressor(n_estimators=30, max_depth=3, random_state=0),
+    DecisionTreeRegressor(max_depth=10, random_state=0),
+], ids=lambda model: type(model).__name__)
+@pytest.mark.parametrize("max_table_cells", [0, None], ids=["traverse", "table"])
+def test_small_fits(model, max_table_cells):
+    model.fit(*_training_data())
+    options = {} if max_table_cells is None else {"max_table_cells": max_table_cells}
+    assert_parity(model, compile_model(model, **options))
+
+
+def test_npz_round_trip(tmp_path):
+    model = GradientBoostingRegressor(n_estimators=30, max_depth=3, random_state=0).fit(*_training_data())
+    compiled = compile_model(model)
+    path = tmp_path / "model.npz"
+    compiled.save(path)
+    loaded = CompiledForest.load(path)
+
+    X = parity_inputs(compiled, 2_000)
+    np.testing.assert_array_equal(loaded.predict(X), compiled.predict(X))
+    np.testing.assert_allclose(loaded.predict(X), model.predict(X), rtol=RTOL, atol=ATOL)
+
+
+def test_unsupported_model():
+    with pytest.raises(ValueError):
+        compile_model(LinearRegression().fit(*_training_data()))
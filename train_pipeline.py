@@ -0,0 +1,282 @@
+"""Reproducible training of the medicine quantity models.
+
+Example::
+
+    python train_pipeline.py                                   # random forest from the historical CSV
+    python train_pipeline.py --source Historical_Data_Medicine.db --promote
+    python train_pipeline.py --source Historical_Data_Medicine.db --if-changed --reuse-params --promote
+    python train_pipeline.py --source Historical_Data_Medicine.db --if-changed --promote --every 24
+
+Features are built the way ``Model/agg_model.ipynb`` built them for
+``best_rf_model.pkl`` and the way ``preprocess_input`` expects them:
+quantities are summed per (Year, Month, Medicine, Season), and each month
+gets its medicine's previous monthly total as ``Prev_Month_Quantity``
+plus a ``Season_Wet`` flag. A SQLite source is read from the
+``MedicineMonthlyQuantities`` summary table, so the cost does not grow
+with the raw row count.
+
+The hyperparameter search runs in parallel across cores. With a fixed
+``--seed`` the same data always gives the same model. Every run is written
+to ``Model/versions/<version>/`` with a ``metadata.json`` that records the
+training rows, data fingerprint, metrics, fit time and feature columns.
+``--promote`` copies the run to the paths the app loads, and compiles it
+with ``tree_engine`` when the model type allows.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import GridSearchCV, train_test_split
+
+from config import HISTORICAL_DATA_PATH, PROJECT_DIR
+from data_loader import _parse_csv
+from medicine_db import read_monthly_quantities
+
+MODEL_DIR = PROJECT_DIR / "Model"
+VERSIONS_DIR = MODEL_DIR / "versions"
+FEATURE_COLUMNS = ["Year", "Month", "Prev_Month_Quantity", "Season_Wet"]
+TARGET = "Quantity(Packets)"
+DEFAULT_SEED = 42
+TEST_SIZE = 0.2
+
+
+def _xgboost_regressor(seed):
+    from xgboost import XGBRegressor
+
+    return XGBRegressor(objective="reg:squarederror", random_state=seed, n_jobs=1)
+
+
+# name -> (estimator factory, parameter grid, artifact the app loads).
+# The grids are the ones the notebooks searched.
+ESTIMATORS = {
+    "rf": (
+        lambda seed: RandomForestRegressor(random_state=seed, n_jobs=1),
+        {"n_estimators": [100, 200], "max_depth": [None, 10, 20], "min_samples_split": [2, 5]},
+        "best_rf_model.pkl",
+    ),
+    "gb": (
+        lambda seed: GradientBoostingRegressor(random_state=seed),
+        {"n_estimators": [100, 200, 300], "max_depth": [3, 5], "learning_rate": [0.05, 0.1]},
+        "best_gb_model.pkl",
+    ),
+    "xgb": (
+        _xgboost_regressor,
+        {"n_estimators": [100, 200, 300], "max_depth": [3, 5, 7], "learning_rate": [0.01, 0.1, 0.2]},
+        "best_xgb_model.pkl",
+    ),
+}
+
+
+def monthly_quantities_from_csv(path=HISTORICAL_DATA_PATH):
+    """Sum the historical CSV per (Year, Month, Medicine, Season)."""
+    df = _parse_csv(path)
+    df["Year"] = df["Date"].dt.year
+    df["Month"] = df["Date"].dt.month
+    return df.groupby(["Year", "Month", "Medicine", "Season"], as_index=False)[TARGET].sum()
+
+
+def monthly_quantities_from_db(conn):
+    """Sum the Medicines summary table per (Year, Month, Medicine, Season)."""
+    histogram = read_monthly_quantities(conn)
+    histogram = histogram[(histogram["Medicine"] != "") & (histogram["Season"] != "")]
+    histogram = histogram.assign(**{TARGET: histogram[TARGET] * histogram["Records"]})
+    return histogram.groupby(["Year", "Month", "Medicine", "Season"], as_index=False)[TARGET].sum()
+
+
+def load_monthly_quantities(source):
+    """Read monthly totals from a CSV file or a SQLite database."""
+    if Path(source).suffix.lower() in (".db", ".sqlite", ".sqlite3"):
+        conn = sqlite3.connect(source)
+        try:
+            return monthly_quantities_from_db(conn)
+        finally:
+            conn.close()
+    return monthly_quantities_from_csv(source)
+
+
+def build_training_frame(monthly):
+    """Add the lag and season features; rows without a previous month are dropped."""
+    monthly = monthly.sort_values(["Year", "Month", "Medicine", "Season"]).reset_index(drop=True)
+    monthly["Prev_Month_Quantity"] = monthly.groupby("Medicine")[TARGET].shift(1)
+    monthly["Season_Wet"] = (monthly["Season"] == "Wet").astype(int)
+    return monthly.dropna(subset=["Prev_Month_Quantity"]).reset_index(drop=True)
+
+
+def data_fingerprint(frame):
+    """Stable hash of the training rows, used to detect new data."""
+    columns = FEATURE_COLUMNS + [TARGET]
+    hashes = pd.util.hash_pandas_object(frame[columns].astype("float64"), index=False)
+    return hashlib.sha256(hashes.to_numpy().tobytes()).hexdigest()[:16]
+
+
+def regression_metrics(y_true, y_pred):
+    return {
+        "mae": float(mean_absolute_error(y_true, y_pred)),
+        "rmse": float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        "r2": float(r2_score(y_true, y_pred)),
+    }
+
+
+def train(frame, estimator="rf", seed=DEFAULT_SEED, n_jobs=-1, cv=5, params=None):
+    """Search hyperparameters, refit on the training split and score the test split.
+
+    With ``params`` the search is skipped and the estimator is fitted with
+    those parameters. Returns ``(model, metadata)``.
+    """
+    make_estimator, grid, _ = ESTIMATORS[estimator]
+    X = frame[FEATURE_COLUMNS].astype(float)
+    y = frame[TARGET].astype(float)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=seed)
+
+    start = time.perf_counter()
+    if params is None:
+        search = GridSearchCV(make_estimator(seed), grid, cv=min(cv, len(X_train)),
+                              scoring="neg_mean_squared_error", n_jobs=n_jobs)
+        search.fit(X_train, y_train)
+        model, params, cv_rmse = search.best_estimator_, search.best_params_, float(np.sqrt(-search.best_score_))
+    else:
+        model = make_estimator(seed).set_params(**params)
+        model.fit(X_train, y_train)
+        cv_rmse = None
+    fit_seconds = time.perf_counter() - start
+
+    metadata = {
+        "estimator": estimator,
+        "model_class": type(model).__name__,
+        "params": params,
+        "seed": seed,
+        "feature_columns": FEATURE_COLUMNS,
+        "training_rows": len(X_train),
+        "test_rows": len(X_test),
+        "data_fingerprint": data_fingerprint(frame),
+        "data_range": [f"{frame['Year'].iloc[0]}-{frame['Month'].iloc[0]:02d}",
+                       f"{frame['Year'].iloc[-1]}-{frame['Month'].iloc[-1]:02d}"],
+        "cv_rmse": cv_rmse,
+        "metrics": regression_metrics(y_test, model.predict(X_test)),
+        "fit_seconds": round(fit_seconds, 3),
+        "sklearn_version": sklearn.__version__,
+    }
+    return model, metadata
+
+
+def save_version(model, metadata, versions_dir=VERSIONS_DIR):
+    """Write a run to ``versions_dir/<version>/`` and return that directory."""
+    version = f"{datetime.now():%Y%m%d-%H%M%S}-{metadata['estimator']}-{metadata['data_fingerprint'][:8]}"
+    metadata = dict(metadata, version=version, trained_at=datetime.now().isoformat(timespec="seconds"))
+    directory = Path(versions_dir) / version
+    directory.mkdir(parents=True)
+    joblib.dump(model, directory / "model.pkl")
+    joblib.dump(metadata["feature_columns"], directory / "feature_columns.pkl")
+    (directory / "metadata.json").write_text(json.dumps(metadata, indent=2))
+    return directory
+
+
+def _replace(source, target):
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def promote(version_dir, model_dir=MODEL_DIR):
+    """Copy a saved run to the artifact paths the app loads.
+
+    The model lands at its ``ESTIMATORS`` artifact name with a ``.json``
+    copy of its metadata next to it, and the feature columns go to
+    ``feature_columns.pkl``. Tree models are also compiled, after a parity
+    check, so the app uses the fast engine right away.
+    """
+    version_dir, model_dir = Path(version_dir), Path(model_dir)
+    metadata = json.loads((version_dir / "metadata.json").read_text())
+    model_path = model_dir / ESTIMATORS[metadata["estimator"]][2]
+
+    _replace(version_dir / "feature_columns.pkl", model_dir / "feature_columns.pkl")
+    _replace(version_dir / "metadata.json", model_path.with_suffix(".json"))
+    _replace(version_dir / "model.pkl", model_path)
+
+    from tree_engine import check_parity, compile_model, parity_inputs
+
+    model = joblib.load(model_path)
+    try:
+        compiled = compile_model(model, source=f"{model_path.name} {metadata['version']}")
+        check_parity(model, compiled, parity_inputs(compiled))
+    except (ValueError, AssertionError):
+        # Not compilable or not exact: the app keeps using the pickle,
+        # since a stale .npz is now older than it.
+        return model_path
+    compiled.save(model_path.with_suffix(".npz"))
+    return model_path
+
+
+def promoted_metadata(estimator, model_dir=MODEL_DIR):
+    """Metadata of the promoted model for ``estimator``, or None."""
+    path = (Path(model_dir) / ESTIMATORS[estimator][2]).with_suffix(".json")
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def run(args):
+    """One pipeline run. Returns the saved version directory, or None if skipped."""
+    frame = build_training_frame(load_monthly_quantities(args.source))
+    if frame.empty:
+        print(f"No training rows in {args.source}", file=sys.stderr)
+        return None
+
+    current = promoted_metadata(args.estimator, args.model_dir)
+    if args.if_changed and current and current.get("data_fingerprint") == data_fingerprint(frame):
+        print(f"No new data since {current['version']}, skipping")
+        return None
+
+    params = current["params"] if args.reuse_params and current else None
+    model, metadata = train(frame, args.estimator, args.seed, args.jobs, args.cv, params)
+    version_dir = save_version(model, metadata, Path(args.model_dir) / "versions")
+    print(f"Saved {version_dir.name}: {metadata['training_rows']} training rows, "
+          f"test RMSE {metadata['metrics']['rmse']:.3f}, R2 {metadata['metrics']['r2']:.3f}, "
+          f"fit {metadata['fit_seconds']:.1f}s, params {metadata['params']}")
+    if args.promote:
+        print(f"Promoted to {promote(version_dir, args.model_dir)}")
+    return version_dir
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train and version the medicine quantity model.")
+    parser.add_argument("--source", default=str(HISTORICAL_DATA_PATH),
+                        help="historical CSV, or a .db/.sqlite file with the Medicines summary table")
+    parser.add_argument("--estimator", choices=sorted(ESTIMATORS), default="rf")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel search workers (-1: all cores)")
+    parser.add_argument("--cv", type=int, default=5, help="cross-validation folds")
+    parser.add_argument("--model-dir", default=str(MODEL_DIR))
+    parser.add_argument("--promote", action="store_true", help="make the new model the one the app loads")
+    parser.add_argument("--if-changed", action="store_true",
+                        help="skip training when the data matches the promoted model's")
+    parser.add_argument("--reuse-params", action="store_true",
+                        help="refit with the promoted model's hyperparameters instead of searching")
+    parser.add_argument("--every", type=float, help="repeat every N hours")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    args = parse_args(argv)
+    while True:
+        run(args)
+        if not args.every:
+            break
+        time.sleep(args.every * 3600)
+
+
+if __name__ == '__main__':
+    main()
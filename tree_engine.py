@@ -0,0 +1,336 @@
+"""Compiled, array-backed inference for tree-ensemble regressors.
+
+A fitted ``RandomForestRegressor``, ``ExtraTreesRegressor``,
+``GradientBoostingRegressor`` or ``DecisionTreeRegressor`` is flattened
+into contiguous node arrays (feature, threshold, children, value) shared by
+all trees. ``CompiledForest.predict`` walks every tree for every row at
+once with NumPy, one tree level per step, so scoring has no per-estimator
+Python dispatch. Models with few distinct thresholds, like the app's
+four-feature forest, are also tabulated over their threshold grid, which
+turns scoring into one binary search per feature. Compiled models are saved
+as ``.npz`` files, which ``model_registry`` loads like any other artifact.
+
+Example::
+
+    python tree_engine.py Model/best_rf_model.pkl              # writes Model/best_rf_model.npz
+    python tree_engine.py Model/best_rf_model.pkl --check-rows 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+FORMAT_VERSION = 1
+CHUNK_ROWS = 2048
+# Models whose threshold grid has at most this many cells also get an exact
+# lookup table, so scoring becomes a few binary searches per row.
+MAX_TABLE_CELLS = 1_000_000
+
+
+def _float32_floor(threshold):
+    """Largest float32 <= each float64 threshold.
+
+    sklearn casts inputs to float32 and tests ``x <= threshold`` in float64;
+    for a float32 ``x`` that is the same test as ``x <= floor32(threshold)``.
+    """
+    rounded = threshold.astype(np.float32)
+    above = rounded.astype(np.float64) > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+class CompiledForest:
+    """Tree ensemble stored as flat node arrays.
+
+    Node ``i`` sends a row to ``children[2 * i]`` when
+    ``X[feature[i]] <= threshold[i]`` and to ``children[2 * i + 1]``
+    otherwise. Leaves point to themselves, so every row can take exactly
+    ``max_depth`` steps. The prediction is
+    ``baseline + scale * aggregate(value[leaf] over trees)``, where the
+    aggregate is the mean for forests and the sum for boosting.
+
+    When ``table`` is set it holds the prediction for every cell of the
+    grid formed by each feature's sorted thresholds (``grid_edges``, split
+    per feature by ``grid_offsets``), and ``predict`` reads it directly.
+    """
+
+    ARRAYS = ("feature", "threshold", "children", "value", "roots")
+    TABLE_ARRAYS = ("grid_edges", "grid_offsets", "table")
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, n_features,
+                 aggregation="mean", scale=1.0, baseline=0.0, feature_names=None, source=None,
+                 grid_edges=None, grid_offsets=None, table=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.aggregation = aggregation
+        self.scale = float(scale)
+        self.baseline = float(baseline)
+        self.feature_names_in_ = None if feature_names is None else np.asarray(feature_names, dtype=object)
+        self.source = source
+        self.grid_edges = grid_edges
+        self.grid_offsets = grid_offsets
+        self.table = table
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        names = self.ARRAYS + (self.TABLE_ARRAYS if self.table is not None else ())
+        return sum(getattr(self, name).nbytes for name in names)
+
+    def _features(self, X):
+        if self.feature_names_in_ is not None and hasattr(X, "columns"):
+            X = X[list(self.feature_names_in_)]
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features_in_}")
+        return X
+
+    def leaves(self, X):
+        """Return the leaf node each row reaches in each tree, shape ``(n_rows, n_trees)``."""
+        X = self._features(X)
+        result = np.empty((len(X), self.n_trees), dtype=self.children.dtype)
+        for start in range(0, len(X), CHUNK_ROWS):
+            rows = X[start:start + CHUNK_ROWS]
+            row_offsets = (np.arange(len(rows)) * self.n_features_in_)[:, None]
+            flat_rows = rows.ravel()
+            nodes = np.broadcast_to(self.roots, (len(rows), self.n_trees)).copy()
+            for _ in range(self.max_depth):
+                go_right = flat_rows[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+                nodes = self.children[2 * nodes + go_right]
+            result[start:start + len(rows)] = nodes
+        return result
+
+    def _predict_traverse(self, X):
+        leaf_values = self.value[self.leaves(X)]
+        if self.aggregation == "mean":
+            total = leaf_values.mean(axis=1)
+        else:
+            total = leaf_values.sum(axis=1)
+        return self.baseline + self.scale * total
+
+    def _grid_shape(self):
+        return tuple(np.diff(self.grid_offsets) + 1)
+
+    def _grid_cells(self, X):
+        bins = [np.searchsorted(self.grid_edges[self.grid_offsets[f]:self.grid_offsets[f + 1]], X[:, f])
+                for f in range(self.n_features_in_)]
+        return np.ravel_multi_index(bins, self._grid_shape())
+
+    def build_table(self, max_cells=MAX_TABLE_CELLS):
+        """Tabulate predictions over the threshold grid; returns False if it has more than ``max_cells`` cells."""
+        split = np.isfinite(self.threshold)
+        edges = [np.unique(self.threshold[split & (self.feature == f)]) for f in range(self.n_features_in_)]
+        shape = tuple(len(e) + 1 for e in edges)
+        if np.prod(shape, dtype=float) > max_cells:
+            return False
+        # One representative row per cell: the cell's upper edge, or just above the last edge
+        representatives = [np.append(e, np.nextafter(e[-1], np.float32(np.inf)) if len(e) else np.float32(0))
+                           for e in edges]
+        grid = np.stack([axis.ravel() for axis in np.meshgrid(*representatives, indexing="ij")], axis=1)
+        self.table = np.concatenate([self._predict_traverse(grid[i:i + 65536]) for i in range(0, len(grid), 65536)])
+        self.grid_edges = np.concatenate(edges).astype(np.float32) if edges else np.empty(0, np.float32)
+        self.grid_offsets = np.concatenate([[0], np.cumsum([len(e) for e in edges])]).astype(np.int64)
+        return True
+
+    def predict(self, X):
+        X = self._features(X)
+        if self.table is not None:
+            return self.table[self._grid_cells(X)]
+        return self._predict_traverse(X)
+
+    def save(self, path):
+        """Write the compiled model as an ``.npz`` file."""
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "max_depth": self.max_depth,
+            "n_features": self.n_features_in_,
+            "aggregation": self.aggregation,
+            "scale": self.scale,
+            "baseline": self.baseline,
+            "feature_names": None if self.feature_names_in_ is None else [str(name) for name in self.feature_names_in_],
+            "source": self.source,
+        }
+        names = self.ARRAYS + (self.TABLE_ARRAYS if self.table is not None else ())
+        with open(path, "wb") as file:
+            np.savez_compressed(file, meta=np.array(json.dumps(meta)),
+                                **{name: getattr(self, name) for name in names})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["format_version"] != FORMAT_VERSION:
+                raise ValueError(f"Unsupported compiled model format {meta['format_version']} in {path}")
+            arrays = {name: data[name] for name in cls.ARRAYS + cls.TABLE_ARRAYS if name in data}
+        return cls(**arrays, max_depth=meta["max_depth"], n_features=meta["n_features"],
+                   aggregation=meta["aggregation"], scale=meta["scale"], baseline=meta["baseline"],
+                   feature_names=meta["feature_names"], source=meta["source"])
+
+
+def _gradient_boosting_baseline(model):
+    init = model.init_
+    if init == "zero":
+        return 0.0
+    if hasattr(init, "constant_"):
+        return float(np.ravel(init.constant_)[0])
+    raise ValueError(f"Unsupported init estimator {type(init).__name__}; only constant baselines can be compiled")
+
+
+def compile_model(model, source=None, max_table_cells=MAX_TABLE_CELLS):
+    """Flatten a fitted single-output tree-ensemble regressor into a ``CompiledForest``.
+
+    A lookup table is added when the threshold grid has at most
+    ``max_table_cells`` cells (0 disables it).
+
+    Raises ``ValueError`` for models that cannot be compiled.
+    """
+    kind = type(model).__name__
+    if kind in ("RandomForestRegressor", "ExtraTreesRegressor"):
+        trees, aggregation, scale, baseline = list(model.estimators_), "mean", 1.0, 0.0
+    elif kind == "GradientBoostingRegressor":
+        trees, aggregation = list(model.estimators_[:, 0]), "sum"
+        scale, baseline = model.learning_rate, _gradient_boosting_baseline(model)
+    elif kind == "DecisionTreeRegressor":
+        trees, aggregation, scale, baseline = [model], "mean", 1.0, 0.0
+    else:
+        raise ValueError(f"Cannot compile {kind}; supported models are random forests, extra trees, "
+                         "gradient boosting and decision tree regressors")
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Only single-output models can be compiled")
+
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    for estimator in trees:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        left = np.where(is_leaf, node_ids, tree.children_left)
+        right = np.where(is_leaf, node_ids, tree.children_right)
+        children.append(np.stack([left, right], axis=1).ravel() + offset)
+        values.append(tree.value[:, 0, 0])
+        offset += tree.node_count
+
+    n_features = model.n_features_in_
+    index_dtype = np.int32 if offset < 2 ** 30 else np.int64
+    compiled = CompiledForest(
+        feature=np.concatenate(features).astype(np.int16 if n_features < 2 ** 15 else np.int32),
+        threshold=_float32_floor(np.concatenate(thresholds).astype(np.float64)),
+        children=np.concatenate(children).astype(index_dtype),
+        value=np.concatenate(values).astype(np.float64),
+        roots=np.array(roots, dtype=index_dtype),
+        max_depth=max(estimator.tree_.max_depth for estimator in trees),
+        n_features=n_features,
+        aggregation=aggregation,
+        scale=scale,
+        baseline=baseline,
+        feature_names=getattr(model, "feature_names_in_", None),
+        source=source or kind,
+    )
+    if max_table_cells:
+        compiled.build_table(max_table_cells)
+    return compiled
+
+
+def parity_inputs(compiled, n_rows=10_000, seed=0):
+    """Rows that exercise every split: random values around each feature's
+    thresholds plus rows sitting exactly on thresholds."""
+    rng = np.random.default_rng(seed)
+    split = np.isfinite(compiled.threshold)
+    X = np.zeros((n_rows, compiled.n_features_in_))
+    for feature in range(compiled.n_features_in_):
+        thresholds = compiled.threshold[split & (compiled.feature == feature)]
+        if len(thresholds) == 0:
+            continue
+        low, high = thresholds.min(), thresholds.max()
+        margin = max(high - low, 1.0) * 0.1
+        X[:, feature] = rng.uniform(low - margin, high + margin, n_rows)
+        on_split = rng.random(n_rows) < 0.25
+        X[on_split, feature] = rng.choice(thresholds, on_split.sum())
+    return X
+
+
+def check_parity(model, compiled, X, rtol=1e-9, atol=1e-9):
+    """Compare compiled and sklearn predictions on ``X``.
+
+    Returns the largest absolute difference; raises ``AssertionError`` if
+    any prediction differs beyond ``rtol``/``atol``.
+    """
+    expected = model.predict(X)
+    actual = compiled.predict(X)
+    diff = np.abs(expected - actual)
+    if not np.allclose(actual, expected, rtol=rtol, atol=atol):
+        worst = int(diff.argmax())
+        raise AssertionError(f"compiled prediction {actual[worst]!r} != sklearn {expected[worst]!r} for row {worst}")
+    return float(diff.max()) if len(diff) else 0.0
+
+
+def _best_time(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compile a tree-ensemble model into the array-backed engine format.")
+    parser.add_argument("model", help="joblib/pickle file with a fitted tree-ensemble regressor")
+    parser.add_argument("--output", help="compiled .npz file (default: next to the model)")
+    parser.add_argument("--check-rows", type=int, default=10_000, help="rows used for the parity check")
+    parser.add_argument("--no-check", action="store_true", help="skip the parity check")
+    parser.add_argument("--max-table-cells", type=int, default=MAX_TABLE_CELLS,
+                        help="largest threshold grid to tabulate (0 disables the lookup table)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import warnings
+
+    import joblib
+
+    args = parse_args(argv)
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    model_path = Path(args.model)
+    model = joblib.load(model_path)
+    compiled = compile_model(model, source=model_path.name, max_table_cells=args.max_table_cells)
+    output = Path(args.output) if args.output else model_path.with_suffix(".npz")
+
+    if not args.no_check:
+        X = parity_inputs(compiled, args.check_rows)
+        try:
+            max_diff = check_parity(model, compiled, X)
+        except AssertionError as e:
+            sys.exit(f"Parity check failed, not writing {output}: {e}")
+        print(f"Parity OK on {len(X):,} rows (max abs difference {max_diff:.3g})")
+        single = X[:1]
+        print(f"single row: sklearn {_best_time(lambda: model.predict(single)) * 1000:.2f}ms, "
+              f"compiled {_best_time(lambda: compiled.predict(single)) * 1000:.2f}ms")
+        print(f"{len(X):,} rows: sklearn {_best_time(lambda: model.predict(X)) * 1000:.2f}ms, "
+              f"compiled {_best_time(lambda: compiled.predict(X)) * 1000:.2f}ms")
+
+    compiled.save(output)
+    table = f", {len(compiled.table):,}-cell table" if compiled.table is not None else ""
+    print(f"Wrote {output}: {compiled.n_trees} trees, {len(compiled.value):,} nodes{table}, "
+          f"{os.path.getsize(output):,} bytes (pickle {os.path.getsize(model_path):,} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Password hashing and bulk user provisioning.
+
+Example::
+
+    python user_provisioning.py staff.csv --database users.db --rounds 12
+
+The CSV needs ``username`` and ``password`` columns. Passwords are hashed
+across a process pool and all new users are inserted in one transaction.
+"""
+import argparse
+import csv
+import io
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.hash import bcrypt
+
+from config import BCRYPT_ROUNDS
+
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    """Hash a password with bcrypt. The cost is stored in the hash itself."""
+    return bcrypt.using(rounds=rounds).hash(password)
+
+
+def hash_rounds(hashed_password):
+    """Return the bcrypt cost a stored hash was created with."""
+    return bcrypt.from_string(hashed_password).rounds
+
+
+def needs_rehash(hashed_password, rounds=BCRYPT_ROUNDS):
+    """True if a stored hash is cheaper than the configured cost."""
+    return hash_rounds(hashed_password) < rounds
+
+
+def _hash_one(args):
+    password, rounds = args
+    return hash_password(password, rounds)
+
+
+def hash_passwords(passwords, rounds=BCRYPT_ROUNDS, workers=None, progress=None):
+    """Hash many passwords in parallel, preserving order.
+
+    ``progress`` is called with ``(done, total)`` as hashes complete.
+    """
+    total = len(passwords)
+    hashes = []
+    if not passwords:
+        return hashes
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for hashed in executor.map(_hash_one, [(password, rounds) for password in passwords]):
+            hashes.append(hashed)
+            if progress:
+                progress(len(hashes), total)
+    return hashes
+
+
+def read_users_csv(file):
+    """Read ``(username, password)`` pairs from a CSV file object or path.
+
+    Returns ``(users, errors)``. Rows with an empty username or password,
+    and repeated usernames, are reported in ``errors`` and skipped.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, newline="", encoding="utf-8-sig") as handle:
+            return read_users_csv(handle)
+    if isinstance(file.read(0), bytes):
+        file = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+
+    users, errors, seen = [], [], set()
+    reader = csv.DictReader(file)
+    missing = {"username", "password"} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
+    for line, row in enumerate(reader, start=2):
+        username = (row["username"] or "").strip()
+        password = row["password"] or ""
+        if not username or not password:
+            errors.append(f"line {line}: username and password cannot be empty")
+        elif username in seen:
+            errors.append(f"line {line}: duplicate username {username}")
+        else:
+            seen.add(username)
+            users.append((username, password))
+    return users, errors
+
+
+def existing_usernames(conn, usernames, batch_size=500):
+    found = set()
+    for i in range(0, len(usernames), batch_size):
+        batch = usernames[i:i + batch_size]
+        cursor = conn.execute(f"SELECT username FROM users WHERE username IN ({', '.join('?' * len(batch))})", batch)
+        found.update(row[0] for row in cursor.fetchall())
+    return found
+
+
+def provision_users(conn, users, rounds=BCRYPT_ROUNDS, workers=None, progress=None):
+    """Add ``(username, password)`` pairs that do not exist yet.
+
+    Existing usernames are skipped before hashing. Returns the added and
+    skipped usernames.
+    """
+    existing = existing_usernames(conn, [username for username, _ in users])
+    new_users = [(username, password) for username, password in users if username not in existing]
+    hashes = hash_passwords([password for _, password in new_users], rounds, workers, progress)
+    with conn:
+        conn.executemany("INSERT INTO users (username, password) VALUES (?, ?)",
+                         [(username, hashed) for (username, _), hashed in zip(new_users, hashes)])
+    return {"added": [username for username, _ in new_users], "skipped": sorted(existing)}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Create users in bulk from a CSV of username,password.")
+    parser.add_argument("file", help="CSV file with username and password columns")
+    parser.add_argument("--database", default="users.db")
+    parser.add_argument("--rounds", type=int, default=BCRYPT_ROUNDS, help="bcrypt cost factor")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from migrations import USERS_MIGRATIONS, apply_migrations
+
+    args = parse_args(argv)
+    users, errors = read_users_csv(args.file)
+    for error in errors:
+        print(error, file=sys.stderr)
+
+    conn = sqlite3.connect(args.database)
+    try:
+        apply_migrations(conn, USERS_MIGRATIONS)
+        result = provision_users(
+            conn, users, args.rounds, args.workers,
+            lambda done, total: print(f"\rHashed {done}/{total}", end="", file=sys.stderr, flush=True),
+        )
+    finally:
+        conn.close()
+    print(file=sys.stderr)
+    print(f"Added {len(result['added'])} users, skipped {len(result['skipped'])} existing, "
+          f"{len(errors)} invalid rows")
+
+
+if __name__ == '__main__':
+    main()